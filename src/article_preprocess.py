@@ -0,0 +1,178 @@
+import re
+from typing import List, Optional
+
+# プロバイダごとの記事本文のトークン予算（プロンプト本体や出力分は含まない）
+PROVIDER_TOKEN_BUDGETS = {
+    "gemini": 6000,
+    "openai": 4000,
+}
+DEFAULT_TOKEN_BUDGET = 4000
+# 先頭から必ず残す段落数（リード文）
+LEAD_PARAGRAPHS = 3
+# この行数以上続くコードらしい行はまとめて省略する
+CODE_BLOCK_MIN_LINES = 4
+CODE_PLACEHOLDER = "（コード省略）"
+
+# 本文に混ざりやすい定型文（短い行の全体がこれに一致したら削除）
+# 記事の文を消さないよう、前後に文が続くパターン（.*）は使わず決まった文言だけにする
+BOILERPLATE_MAX_CHARS = 60
+BOILERPLATE_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r"^(この記事を|記事を)?(シェア|共有)(する)?$",
+        r"^(Share|Tweet|ツイート|いいね|ブックマーク|はてブ|Pocket)[!！]?$",
+        r"^(関連記事|関連する記事|おすすめ記事|人気記事|あわせて読みたい|Related( Articles| Posts)?)[:：]?$",
+        r"^(すべての|全ての)?(Cookie|クッキー)(の(使用|利用))?(に同意(する|します)|を(受け入れる|許可する))$",
+        r"^(このサイト|当サイト|本サイト)(では|は)(Cookie|クッキー)を(使用|利用)しています[。.]?$",
+        r"^Accept (all )?cookies$",
+        r"^(広告|PR|スポンサー|Sponsored|Advertisement)$",
+        r"^(ログイン|会員登録|新規登録|コメント)(する|はこちら)?$",
+        r"^(Copyright|©|\(c\))\s*(©|\(c\))?\s*\d{4}([-–]\d{4})?\b.*$",
+        r"^.*All Rights Reserved\.?$",
+        r"^(この記事が気に入ったら(サポート|フォロー)をしてみませんか[?？]?|フォローする|サポートする)$",
+    )
+]
+CODE_LINE_RE = re.compile(
+    r"^\s{2,}\S|[{};]\s*$|^\s*(def|class|import|from|return|if|for|while|const|let|var|function|public|private|#include)\b|^\s*[$>] |=>|::|</?\w+[^>]*>"
+)
+CJK_RE = re.compile(r"[　-ヿ㐀-鿿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数の概算。日本語（CJK）は1文字≒1トークン、それ以外は4文字≒1トークンとする。
+    """
+    if not text:
+        return 0
+    cjk = len(CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _is_boilerplate(line: str) -> bool:
+    return len(line) <= BOILERPLATE_MAX_CHARS and any(
+        p.match(line) for p in BOILERPLATE_PATTERNS
+    )
+
+
+def strip_boilerplate(text: str) -> str:
+    """定型文の行と、長いコードの塊を取り除く"""
+    lines = [line.rstrip() for line in text.split("\n")]
+    lines = [line for line in lines if not _is_boilerplate(line.strip())]
+
+    result = []
+    code_run = []
+
+    def flush_code():
+        if len(code_run) >= CODE_BLOCK_MIN_LINES:
+            result.append(CODE_PLACEHOLDER)
+        else:
+            result.extend(code_run)
+        code_run.clear()
+
+    for line in lines:
+        if line.strip() and CODE_LINE_RE.search(line):
+            code_run.append(line)
+        else:
+            flush_code()
+            result.append(line)
+    flush_code()
+
+    # 同じ行の繰り返し（ナビゲーションなど）を除く
+    seen = set()
+    deduped = []
+    for line in result:
+        key = line.strip()
+        if key and key in seen and len(key) < 40:
+            continue
+        seen.add(key)
+        deduped.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(deduped)).strip()
+
+
+def _split_paragraphs(text: str) -> List[str]:
+    return [p.strip() for p in re.split(r"\n+", text) if p.strip()]
+
+
+def _bigrams(text: str) -> set:
+    text = re.sub(r"\s+", "", text.lower())
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def _score_paragraph(paragraph: str, title_bigrams: set) -> float:
+    """タイトルとの重なり・数字・固有名詞っぽさで段落の情報量を見積もる"""
+    if paragraph == CODE_PLACEHOLDER:
+        return 0.0
+    bigrams = _bigrams(paragraph)
+    overlap = len(bigrams & title_bigrams) / (len(title_bigrams) or 1)
+    digits = min(len(re.findall(r"\d+", paragraph)), 5) * 0.1
+    names = min(len(re.findall(r"[A-Z][A-Za-z0-9]+|[ァ-ヴー]{3,}", paragraph)), 5) * 0.1
+    length = min(estimate_tokens(paragraph) / 80, 1.0)
+    return overlap * 2 + digits + names + length
+
+
+def trim_to_budget(text: str, budget: int, title: str = "") -> str:
+    """
+    予算内に収まるように段落を選ぶ。先頭の LEAD_PARAGRAPHS 段落を優先し、
+    残りは情報量の高い順に採用して元の順序で並べ直す。
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    paragraphs = _split_paragraphs(text)
+    title_bigrams = _bigrams(title)
+
+    selected = set()
+    used = 0
+    for i, paragraph in enumerate(paragraphs[:LEAD_PARAGRAPHS]):
+        cost = estimate_tokens(paragraph)
+        if used + cost > budget:
+            break
+        selected.add(i)
+        used += cost
+
+    ranked = sorted(
+        range(LEAD_PARAGRAPHS, len(paragraphs)),
+        key=lambda i: _score_paragraph(paragraphs[i], title_bigrams),
+        reverse=True,
+    )
+    for i in ranked:
+        cost = estimate_tokens(paragraphs[i])
+        if used + cost <= budget:
+            selected.add(i)
+            used += cost
+
+    if not selected and paragraphs:
+        # 先頭段落だけで予算を超える場合は文字数で切る
+        return _truncate(paragraphs[0], budget)
+    return "\n".join(paragraphs[i] for i in sorted(selected))
+
+
+def _truncate(text: str, budget: int) -> str:
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+def get_token_budget(provider: Optional[str] = None) -> int:
+    return PROVIDER_TOKEN_BUDGETS.get(provider or "gemini", DEFAULT_TOKEN_BUDGET)
+
+
+def preprocess_article(
+    text: str,
+    title: str = "",
+    provider: Optional[str] = None,
+    budget: Optional[int] = None,
+) -> str:
+    """
+    要約に渡す前に記事本文を整える（定型文・コードの除去 → トークン予算内に削減）。
+    budget 未指定の場合はプロバイダごとの PROVIDER_TOKEN_BUDGETS を使う。
+    """
+    if not text:
+        return ""
+    if budget is None:
+        budget = get_token_budget(provider)
+    return trim_to_budget(strip_boilerplate(text), budget, title=title)
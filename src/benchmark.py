@@ -0,0 +1,263 @@
+import os
+import argparse
+import time
+import sys
+
+
+def _timeit(func, repeat):
+    """func を repeat 回実行し、1回あたりの平均秒数を返す"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+########################################
+# ホットエントリーHTMLのパーサ比較
+########################################
+# 保存済みのホットエントリーHTML（tests/fixtures）
+HOTENTRY_FIXTURE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "tests", "fixtures", "hotentry_it.html"
+)
+
+
+def bench_parser(html_path: str, repeat: int = 20) -> bool:
+    """
+    保存済みのホットエントリーHTMLで各パーサの結果が一致するかを確認し、速度を比較する。
+    一致しないパーサがあれば False を返す。
+    """
+    from hatena_scraper import parse_hatena_entries, HTML_PARSERS, parser_available
+
+    with open(html_path, encoding="utf-8") as f:
+        html = f.read()
+
+    expected = parse_hatena_entries(html, parser="html.parser")
+    print(f"エントリー件数: {len(expected)}")
+    ok = True
+    for parser in HTML_PARSERS:
+        if not parser_available(parser):
+            print(f"{parser}: 未インストールのためスキップ")
+            continue
+        entries = parse_hatena_entries(html, parser=parser)
+        if entries != expected:
+            ok = False
+            print(f"{parser}: 結果が html.parser と一致しません")
+            for a, b in zip(expected, entries):
+                if a != b:
+                    print(f"  期待値: {a}\n  実際値: {b}")
+                    break
+        elapsed = _timeit(lambda: parse_hatena_entries(html, parser=parser), repeat)
+        print(f"{parser}: {elapsed * 1000:.2f} ms/回")
+    return ok
+
+
+########################################
+# スクレイピング処理のスループット（HTTPアーカイブで再現）
+########################################
+def bench_scrape(
+    archive_path: str = None,
+    record: bool = False,
+    rank_limit: int = 7,
+    repeat: int = 3,
+    use_process_pool: bool = False,
+):
+    """
+    record=True ならライブのサイトから取得してアーカイブに記録し、
+    そうでなければアーカイブから再生してホットエントリー取得〜本文抽出の時間を計測する。
+    キャッシュを使うと計測にならないため HTTP キャッシュと抽出キャッシュは無効にする。
+    """
+    import tempfile
+    import http_client
+    import hatena_scraper
+
+    http_client.set_archive_mode("record" if record else "replay", archive_path)
+    http_client.CACHE_ENABLED = False
+    if record:
+        repeat = 1
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i in range(repeat):
+            hatena_scraper.EXTRACT_CACHE_DIR = os.path.join(tmp_dir, str(i))
+            start = time.perf_counter()
+            entries = hatena_scraper.fetch_hatena_news_entries()[:rank_limit]
+            listed = time.perf_counter()
+            bodies = hatena_scraper.fetch_article_contents(
+                [item["url"] for item in entries], use_process_pool=use_process_pool
+            )
+            end = time.perf_counter()
+            print(
+                f"[{i + 1}/{repeat}] 一覧: {(listed - start) * 1000:.1f} ms, "
+                f"本文 {len(bodies)} 件: {(end - listed) * 1000:.1f} ms, "
+                f"合計: {(end - start) * 1000:.1f} ms, "
+                f"本文文字数: {sum(len(body) for body in bodies)}"
+            )
+
+
+########################################
+# simple() のチェーン組み立て・呼び出しのオーバーヘッド（偽のLLMで計測）
+########################################
+def bench_simple(repeat: int = 200):
+    """
+    LLM を即座に応答する FakeListChatModel に差し替え、1回あたりの
+    (a) 従来の LLMChain + SequentialChain を毎回組み立てて実行
+    (b) 組み立て済みの FastChain（プロンプト整形と出力の取り出しを直接行う）を使い回して実行
+    の時間と確保メモリを比較する。結果の形が同じであることも確認する。
+    """
+    import io
+    import tracemalloc
+    from contextlib import redirect_stdout
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    import utils
+
+    utils._create_llm = lambda *args, **kwargs: FakeListChatModel(responses=["ok"])
+    utils.RATE_LIMIT_ENABLED = False
+    utils.enable_llm_cache(False)
+    utils.enable_hedging(False)
+
+    paths = {
+        "LLMChain + SequentialChain": lambda: utils.invoke_chain(
+            utils._build_simple_chain(), {"topic": "t"}, workflow="bench"
+        ),
+        "FastChain（LLM を直接呼び出し）": lambda: utils.invoke_chain(
+            utils._simple_chain(), {"topic": "t"}, workflow="bench"
+        ),
+    }
+    results = {}
+    # get_llm のログ出力は計測から除く
+    with redirect_stdout(io.StringIO()):
+        for name, func in paths.items():
+            results[name] = func()
+            _timeit(func, 10)
+            elapsed = _timeit(func, repeat)
+            tracemalloc.start()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name] = (results[name], elapsed, peak)
+    outputs = [output for output, _, _ in results.values()]
+    print(f"結果の形が一致: {all(output == outputs[0] for output in outputs)}")
+    for name, (_, elapsed, peak) in results.items():
+        print(f"{name}: {elapsed * 1000:.3f} ms/回, ピークメモリ {peak / 1024:.1f} KiB")
+
+
+########################################
+# 各エントリーポイントの import 時間（python -X importtime）
+########################################
+ENTRY_POINTS = ["get_news_hatena", "post_note", "post_community", "utils"]
+
+
+def _importtime(module: str):
+    """
+    別プロセスで python -X importtime -c "import module" を実行し、
+    (module の累積マイクロ秒, {直接 import したモジュール: 累積マイクロ秒}) を返す。
+    """
+    import subprocess
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"{module} の import に失敗しました:\n{result.stderr[-2000:]}"
+        )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        name = name[1:]
+        level = (len(name) - len(name.lstrip())) // 2
+        rows.append((level, name.strip(), int(cumulative)))
+    # module の行は自分の依存の後に出力されるので、その直前のレベル1の行が直接の依存
+    end = max(i for i, row in enumerate(rows) if row[:2] == (0, module))
+    total = rows[end][2]
+    children = {}
+    for level, name, us in reversed(rows[:end]):
+        if level == 0:
+            break
+        if level == 1:
+            children[name] = us
+    return total, children
+
+
+def bench_importtime(
+    modules: list = None, repeat: int = 3, top: int = 8, output: str = None
+):
+    """
+    各エントリーポイントの import 時間を repeat 回計測して最小値を表示する。
+    output を指定すると結果を JSON Lines で追記し、起動時間の推移を追えるようにする。
+    """
+    import json
+    from datetime import datetime
+
+    results = {}
+    for module in modules or ENTRY_POINTS:
+        runs = [_importtime(module) for _ in range(repeat)]
+        total, children = min(runs, key=lambda run: run[0])
+        results[module] = round(total / 1000, 1)
+        print(f"{module}: {total / 1000:.1f} ms")
+        for name, us in sorted(children.items(), key=lambda kv: -kv[1])[:top]:
+            print(f"  {name}: {us / 1000:.1f} ms")
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "a", encoding="utf-8") as f:
+            record = {"measured_at": datetime.now().isoformat(), "import_ms": results}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="NoteAutoTech ベンチマーク")
+    sub = arg_parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("parser", help="ホットエントリーHTMLパーサの一致確認と速度比較")
+    p.add_argument("html_path", nargs="?", default=HOTENTRY_FIXTURE)
+    p.add_argument("--repeat", type=int, default=20)
+
+    p = sub.add_parser(
+        "scrape",
+        help="HTTPアーカイブを再生してスクレイピング処理を計測（--record で記録）",
+    )
+    p.add_argument("--archive", default=None)
+    p.add_argument("--record", action="store_true")
+    p.add_argument("--rank", type=int, default=7)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--process-pool", action="store_true")
+
+    p = sub.add_parser(
+        "simple", help="simple() の呼び出しオーバーヘッドを偽のLLMで比較"
+    )
+    p.add_argument("--repeat", type=int, default=200)
+
+    p = sub.add_parser(
+        "importtime",
+        help="各エントリーポイントの import 時間を計測（python -X importtime）",
+    )
+    p.add_argument("modules", nargs="*", default=None)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--top", type=int, default=8)
+    p.add_argument("--output", default=None, help="結果を追記する JSON Lines ファイル")
+
+    args = arg_parser.parse_args()
+    if args.command == "parser":
+        sys.exit(0 if bench_parser(args.html_path, args.repeat) else 1)
+    elif args.command == "scrape":
+        bench_scrape(
+            args.archive,
+            record=args.record,
+            rank_limit=args.rank,
+            repeat=args.repeat,
+            use_process_pool=args.process_pool,
+        )
+    elif args.command == "importtime":
+        bench_importtime(
+            args.modules or None,
+            repeat=args.repeat,
+            top=args.top,
+            output=args.output,
+        )
+    elif args.command == "simple":
+        bench_simple(args.repeat)
@@ -1,13 +1,25 @@
 import os
 from datetime import datetime, timedelta
-from hatena_scraper import fetch_hatena_news_entries, fetch_article_content_from_url
+from hatena_scraper import fetch_hatena_news_entries, fetch_article_contents
 from history_manager import (
     load_history,
     save_history_json,
 )
-from utils import simple
-from post_note import main as post_note
-from typing import List, Dict
+from utils import (
+    simple,
+    simple_batch,
+    get_llm,
+    get_llm_pool_stats,
+    llm_config,
+    enable_hedging,
+    get_hedge_stats,
+    get_rate_limit_stats,
+)
+import llm_metrics
+from article_preprocess import preprocess_article
+from near_duplicate import NearDuplicateIndex, dedupe_entries
+from typing import List, Dict, Optional, Tuple
+from pydantic import BaseModel, Field
 import asyncio
 import sys
 import random
@@ -15,6 +27,11 @@ import random
 ALL_RANK = 7
 DEFAULT_RANK_LIMIT = 3
 RANK_LIMIT = DEFAULT_RANK_LIMIT
+# 近似重複で除外される分を見込んで、本文を余分に取得する件数
+DEDUP_SPARE = 4
+# Gemini が遅い・レート制限のときに OpenAI へヘッジ／フェイルオーバーする
+# 別プロバイダへの有料の重複呼び出しになるためオプトイン（環境変数 LLM_HEDGE=1 でも有効）
+HEDGE_LLM = False
 
 # 魚拓シリーズに使える絵文字のリスト
 emoji_list = [
@@ -63,6 +80,33 @@ ARTICLE_SUMMARY_PROMPT = [
 先頭や文末に～をまとめましたや改行などの情報は不要です。""",
 ]
 
+# 複数記事をまとめて1リクエストで要約する場合のプロンプト
+PACKED_SUMMARY_PROMPT = """あなたはプロのライターです。
+以下の複数の記事それぞれについて、タイトルから記事で一番伝えたい部分を考察し、
+summaryTitle に自分なりのタイトルを20文字程度で、
+points に箇条書き（記号なし）を3つ、1つは40文字(80byte)なのでそれ以下で、
+summary に300文字以内の要約を記載してください。
+index には各記事の番号をそのまま記載してください。
+先頭や文末に～をまとめましたや改行などの情報は不要です。"""
+
+# 要約の実行方法
+# "batch": 記事ごとのプロンプトを .batch() で並列に実行
+# "packed": 複数記事を1リクエストにまとめて構造化出力で受け取る
+SUMMARY_MODE = "batch"
+PACKED_ARTICLES_PER_REQUEST = 4
+
+
+class ArticleSummary(BaseModel):
+    index: int = Field(description="記事の番号")
+    summaryTitle: str = Field(description="20文字程度のタイトル")
+    points: List[str] = Field(description="40文字以下の箇条書き3つ")
+    summary: str = Field(description="300文字以内の要約")
+
+
+class ArticleSummaries(BaseModel):
+    items: List[ArticleSummary]
+
+
 # 全体評価プロンプト
 ARTICLE_EVALUATION_PROMPT = [
     """次のまとめた記事を総評してください。1行目はランキングの中から最も目立つ or 役立ちそうな内容を一つに絞ってタイトルを60文字程度でトレンドに沿ってとっても刺激的に記載してください。以降の行は総評を記載してください。箇条書きの場合は（記号なし）で1行は30文字(60byte)なのでそれ以下。後半には決まり文句と、最後の行にはハッシュタグを記載してください。
@@ -136,7 +180,106 @@ def save_titles_to_weekly_txt(txt_path: str, titles: list):
                 f.write(title + "\n")
 
 
+def parse_summary(summary: str) -> Dict:
+    """要約結果（1行目タイトル、2~4行目箇条書き、以降要約）を辞書にする"""
+    if not summary:
+        return {}
+    lines = [line for line in summary.split("\n") if line.strip()]
+    return {
+        "summaryTitle": lines[0],
+        "points": lines[1:4],
+        "summary": "\n".join(lines[4:]).strip(),
+    }
+
+
+def _summarize_batch(articles: List[Tuple[str, str]]) -> List[Dict]:
+    topics = [f"""{ARTICLE_SUMMARY_PROMPT[0]}
+
+タイトル: {title}
+記事: {body}""" for title, body in articles]
+    return [parse_summary(summary) for summary in simple_batch(topics)]
+
+
+def _summarize_packed(articles: List[Tuple[str, str]]) -> List[Dict]:
+    """
+    PACKED_ARTICLES_PER_REQUEST 件ずつ1リクエストにまとめて構造化出力で要約する。
+    応答に含まれなかった記事は記事ごとの要約にフォールバックする。
+    """
+    structured_llm = get_llm("gemini", "gemini-2.0-flash").with_structured_output(
+        ArticleSummaries
+    )
+    groups = [
+        list(range(start, min(start + PACKED_ARTICLES_PER_REQUEST, len(articles))))
+        for start in range(0, len(articles), PACKED_ARTICLES_PER_REQUEST)
+    ]
+    prompts = []
+    for group in groups:
+        blocks = "\n\n".join(f"""### 記事{i}
+タイトル: {articles[i][0]}
+記事: {articles[i][1]}""" for i in group)
+        prompts.append(f"{PACKED_SUMMARY_PROMPT}\n\n{blocks}")
+    responses = structured_llm.batch(
+        prompts, config=llm_config("packed_summary"), return_exceptions=True
+    )
+
+    results: List[Optional[Dict]] = [None] * len(articles)
+    for group, response in zip(groups, responses):
+        if isinstance(response, Exception) or response is None:
+            print(f"まとめて要約に失敗しました: {response}")
+            continue
+        for item in response.items:
+            # 箇条書きが3つ未満だと markdown に変換できないので記事ごとの要約に回す
+            if item.index in group and item.summaryTitle and len(item.points) >= 3:
+                results[item.index] = {
+                    "summaryTitle": item.summaryTitle,
+                    "points": item.points[:3],
+                    "summary": item.summary.strip(),
+                }
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        print(f"記事ごとの要約にフォールバックします: {missing}")
+        for i, result in zip(missing, _summarize_batch([articles[i] for i in missing])):
+            results[i] = result
+    return results
+
+
+def summarize_articles(
+    articles: List[Optional[Tuple[str, str]]], mode: str = None
+) -> List[Dict]:
+    """
+    (タイトル, 本文) のリストを要約し、同じ順序で summaryTitle / points / summary の辞書を返す。
+    None の要素は要約せず空の辞書を返す。
+    mode: "batch" / "packed"（未指定なら SUMMARY_MODE）
+    """
+    mode = mode or SUMMARY_MODE
+    targets = [i for i, article in enumerate(articles) if article is not None]
+    results: List[Dict] = [{} for _ in articles]
+    if not targets:
+        return results
+    if mode == "packed":
+        summaries = _summarize_packed([articles[i] for i in targets])
+    elif mode == "batch":
+        summaries = _summarize_batch([articles[i] for i in targets])
+    else:
+        raise ValueError(f"Unknown summary mode: {mode}")
+    for i, summary in zip(targets, summaries):
+        results[i] = summary
+    return results
+
+
 def main(publish=True, is_note_write=False):
+    now = datetime.now()
+    try:
+        _main(now, publish, is_note_write)
+    finally:
+        # 要約・評価・投稿で失敗した実行の計測結果も history/metrics に残す
+        llm_metrics.save_report(llm_metrics.run_name("news", now))
+
+
+def _main(now, publish, is_note_write):
+    if HEDGE_LLM:
+        enable_hedging()
     entries = fetch_hatena_news_entries()
     is_all = ALL_RANK == RANK_LIMIT
 
@@ -144,7 +287,6 @@ def main(publish=True, is_note_write=False):
         print("エントリーが見つかりませんでした。セレクタを確認してください。")
         return
 
-    now = datetime.now()
     # historyディレクトリをsrcの一つ上のディレクトリに指定
     history_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "history")
     os.makedirs(history_dir, exist_ok=True)
@@ -166,11 +308,27 @@ def main(publish=True, is_note_write=False):
         if item["title"] not in history and item["title"] not in recorded_titles
     ][:30]
 
+    # 近似重複で除く分を見込んで多めに本文を取得しておく（ランキング順のまま並列に取得）
+    candidates = top_entries[: RANK_LIMIT + DEDUP_SPARE]
+    candidate_bodies = fetch_article_contents([item["url"] for item in candidates])
+
+    # 同じ話題の記事（今回の一覧内と、同じ週の過去の実行分）を1件にまとめる
+    dedupe_index = NearDuplicateIndex(
+        os.path.join(weekly_txt_dir, "near_duplicates.json") if not is_all else None
+    )
+    kept, skipped = dedupe_entries(
+        candidates, candidate_bodies, dedupe_index, limit=RANK_LIMIT
+    )
+    for i, match in skipped:
+        print(f"近似重複のため除外: {candidates[i]['title']} ≒ {match['title']}")
+
     # top_entriesをトップ7に絞り込む
-    top_entries = top_entries[:RANK_LIMIT]
+    top_entries = [candidates[i] for i in kept]
+    url_bodies = [candidate_bodies[i] for i in kept]
 
     # top_entriesのタイトルを週ごとのtxtに記録
     if publish and not is_all:
+        dedupe_index.save()
         save_titles_to_weekly_txt(
             weekly_txt_path, [item["title"] for item in top_entries]
         )
@@ -191,6 +349,17 @@ def main(publish=True, is_note_write=False):
         # print(note_kokoroe)
     with open(NOTE_SAMPLE_PATH, encoding="utf-8") as f:
         note_sample = f.read()
+    # 定型文やコードを除き、トークン予算内に収めてから要約に渡す
+    summaries = summarize_articles(
+        [
+            (
+                (item["title"], preprocess_article(body, title=item["title"]))
+                if item["url"]
+                else None
+            )
+            for item, body in zip(top_entries, url_bodies)
+        ]
+    )
     for idx, item in enumerate(top_entries):
         try:
             users_num = int(item["users"].replace(",", "")) if item["users"] else 0
@@ -203,21 +372,8 @@ def main(publish=True, is_note_write=False):
             "users": users_num,
         }
 
-        summary = ""
-        if item["url"]:
-            urlBody = fetch_article_content_from_url(item["url"])
-            results = simple(
-                topic=f"""{ARTICLE_SUMMARY_PROMPT[0]}
-
-タイトル: {item['title']}
-記事: {urlBody}""",
-            )
-            summary = results[0]
-            if summary:
-                lines = [line for line in summary.split("\n") if line.strip()]
-                entry["summaryTitle"] = lines[0]
-                entry["points"] = lines[1:4]
-                entry["summary"] = "\n".join(lines[4:]).strip()
+        if summaries[idx]:
+            entry.update(summaries[idx])
 
         entries_for_json.append(entry)
     save_history_json(json_filename, entries_for_json)
@@ -247,8 +403,14 @@ def main(publish=True, is_note_write=False):
     )
     with open(md_filename, "w", encoding="utf-8") as f:
         f.write(markdown)
+    print(f"LLMクライアントプール: {get_llm_pool_stats()}")
+    print(f"LLMヘッジ: {get_hedge_stats()}")
+    print(f"LLMレート制限: {get_rate_limit_stats()}")
 
     if is_note_write:
+        # note への投稿時だけ playwright などを読み込む
+        from post_note import main as post_note
+
         asyncio.run(post_note(md_filename, headless=False, publish=publish))
 
 
@@ -1,77 +1,451 @@
+import os
 import requests
+import hashlib
 from bs4 import BeautifulSoup
-import time
 import re
-from trafilatura import extract
+import time
+import threading
+import concurrent.futures
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from xml.etree import ElementTree
+import http_client
+
+# 記事本文を同時に取得するスレッド数
+FETCH_MAX_WORKERS = 8
+# 本文抽出に使うプロセス数（None なら CPU コア数）
+EXTRACT_MAX_WORKERS = None
+# 抽出済み本文のキャッシュ保存先（srcの一つ上の cache/extract）
+EXTRACT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "cache", "extract"
+)
+# 抽出キャッシュの保持期間（秒）とサイズ上限（超えたら最終アクセスが古いものから削除）
+EXTRACT_CACHE_TTL = 7 * 24 * 60 * 60
+EXTRACT_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+
+HOTENTRY_BASE_URL = "https://b.hatena.ne.jp/hotentry"
+# はてなブックマークのホットエントリーのカテゴリ
+HATENA_CATEGORIES = (
+    "it",
+    "economics",
+    "knowledge",
+    "life",
+    "social",
+    "entertainment",
+    "game",
+    "fun",
+)
+
+# RSS / Atom の要素名（名前空間を除いたローカル名）
+FEED_ITEM_TAGS = ("item", "entry")
+FEED_DATE_TAGS = ("date", "pubDate", "updated", "published")
+FEED_CHUNK_SIZE = 16 * 1024
+
+ENTRY_SELECTORS = (
+    "li.entrylist-image-entry .entrylist-contents",
+    ".js-hotentries .entrylist-contents",
+)
+TITLE_SELECTOR = "h3.entrylist-contents-title a"
+DATE_SELECTOR = "ul.entrylist-contents-meta li.entrylist-contents-date"
+USERS_SELECTOR = "span.entrylist-contents-users a span"
+USERS_CONTAINER_SELECTOR = "span.entrylist-contents-users"
+
+
+# ホットエントリーHTMLのパーサと必要なモジュール（速い順）
+HTML_PARSERS = ("selectolax", "lxml", "html.parser")
+PARSER_MODULES = {"selectolax": "selectolax.lexbor", "lxml": "lxml"}
+
+
+def parser_available(parser):
+    module = PARSER_MODULES.get(parser)
+    if module is None:
+        return True
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+# 既定のパーサ。None なら最初のパース時に、利用可能なもののうち最も速いものを選ぶ
+# （import 時にパーサのライブラリを読み込まないようにするため）
+DEFAULT_HTML_PARSER = None
+
+
+def default_html_parser():
+    global DEFAULT_HTML_PARSER
+    if DEFAULT_HTML_PARSER is None:
+        DEFAULT_HTML_PARSER = next(
+            name for name in HTML_PARSERS if parser_available(name)
+        )
+    return DEFAULT_HTML_PARSER
+
+
+def _users_from_text(text):
+    match = re.search(r"(\d+)", text)
+    return match.group(1) if match else ""
+
+
+def _iter_entries_bs4(html, features):
+    soup = BeautifulSoup(html, features)
+    entry_elements = []
+    for selector in ENTRY_SELECTORS:
+        entry_elements += soup.select(selector)
+    for el in entry_elements:
+        anchor = el.select_one(TITLE_SELECTOR) or el.select_one("a")
+        date_el = el.select_one(DATE_SELECTOR)
+        users_el = el.select_one(USERS_SELECTOR)
+        users = users_el.get_text(strip=True) if users_el else ""
+        if not users:
+            users_container = el.select_one(USERS_CONTAINER_SELECTOR)
+            if users_container:
+                users = _users_from_text(users_container.get_text())
+        yield {
+            "title": anchor.get_text(strip=True) if anchor else "",
+            "url": anchor.get("href") if anchor else None,
+            "date": date_el.get_text(strip=True) if date_el else "",
+            "users": users,
+            "found": anchor is not None,
+        }
+
+
+def _iter_entries_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
 
+    tree = LexborHTMLParser(html)
+    entry_elements = []
+    for selector in ENTRY_SELECTORS:
+        entry_elements += tree.css(selector)
+    for el in entry_elements:
+        anchor = el.css_first(TITLE_SELECTOR) or el.css_first("a")
+        date_el = el.css_first(DATE_SELECTOR)
+        users_el = el.css_first(USERS_SELECTOR)
+        users = users_el.text(strip=True) if users_el else ""
+        if not users:
+            users_container = el.css_first(USERS_CONTAINER_SELECTOR)
+            if users_container:
+                users = _users_from_text(users_container.text())
+        yield {
+            "title": anchor.text(strip=True) if anchor else "",
+            "url": anchor.attributes.get("href") if anchor else None,
+            "date": date_el.text(strip=True) if date_el else "",
+            "users": users,
+            "found": anchor is not None,
+        }
+
+
+def parse_hatena_entries(html, parser=None):
+    """
+    ホットエントリーのHTMLから title, url, date, users の辞書リストを作る。
+    parser: "html.parser" / "lxml" / "selectolax"（未指定なら default_html_parser()）
+    どのパーサでも同じ結果になるようにセレクタと文字列処理を揃えている。
+    """
+    parser = parser or default_html_parser()
+    if parser == "selectolax":
+        items = _iter_entries_selectolax(html)
+    elif parser in ("lxml", "html.parser"):
+        items = _iter_entries_bs4(html, parser)
+    else:
+        raise ValueError(f"Unknown parser: {parser}")
 
-def fetch_hatena_news_entries():
-    url = "https://b.hatena.ne.jp/hotentry/it"
-    max_attempts = 5
-    attempt_count = 0
     entries = []
-    while attempt_count < max_attempts:
+    seen = set()
+    for item in items:
+        if item.pop("found") and item["url"] not in seen:
+            seen.add(item["url"])
+            entries.append(item)
+    return entries
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _format_feed_date(text):
+    """フィードの日付（ISO 8601 / RFC 822）を HTML と同じ YYYY/MM/DD HH:MM 形式にする"""
+    text = (text or "").strip()
+    if not text:
+        return ""
+    try:
+        date = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-            entry_elements = soup.select("li.entrylist-image-entry .entrylist-contents")
-            entry_elements += soup.select(".js-hotentries .entrylist-contents")
-            # print("entry_elements件数:", len(entry_elements))
-            seen = set()
-            for el in entry_elements:
-                anchor = el.select_one(
-                    "h3.entrylist-contents-title a"
-                ) or el.select_one("a")
-                date_el = el.select_one(
-                    "ul.entrylist-contents-meta li.entrylist-contents-date"
-                )
-                date = date_el.get_text(strip=True) if date_el else ""
-                users_el = el.select_one("span.entrylist-contents-users a span")
-                users = users_el.get_text(strip=True) if users_el else ""
-                if not users:
-                    users_container = el.select_one("span.entrylist-contents-users")
-                    if users_container:
-                        match = re.search(r"(\d+)", users_container.get_text())
-                        if match:
-                            users = match.group(1)
-                if anchor and anchor.get("href") not in seen:
-                    seen.add(anchor.get("href"))
-                    entries.append(
-                        {
-                            "title": anchor.get_text(strip=True),
-                            "url": anchor.get("href"),
-                            "date": date,
-                            "users": users,
-                        }
-                    )
-            # print("entries件数:", len(entries))
-            # with open("hatena_debug.html", "w", encoding="utf-8") as f:
-            #     f.write(response.text)
-            break
+            date = parsedate_to_datetime(text)
+        except (TypeError, ValueError):
+            return text
+    return date.strftime("%Y/%m/%d %H:%M")
+
+
+def parse_hatena_feed(chunks):
+    """
+    ホットエントリーのRSS（RSS 1.0 / 2.0 / Atom）をストリーミングでパースし、
+    parse_hatena_entries と同じ title, url, date, users の辞書リストを返す。
+    chunks: バイト列のイテレータ（レスポンスの iter_content など）
+    """
+    parser = ElementTree.XMLPullParser(events=("end",))
+    entries = []
+    seen = set()
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, el in parser.read_events():
+            if _local_name(el.tag) not in FEED_ITEM_TAGS:
+                continue
+            item = {"title": "", "url": "", "date": "", "users": ""}
+            for child in el:
+                name = _local_name(child.tag)
+                text = (child.text or "").strip()
+                if name == "title":
+                    item["title"] = text
+                elif name == "link":
+                    item["url"] = text or child.get("href", "")
+                elif name in FEED_DATE_TAGS and not item["date"]:
+                    item["date"] = _format_feed_date(text)
+                elif name == "bookmarkcount":
+                    item["users"] = text
+            if item["url"] and item["url"] not in seen:
+                seen.add(item["url"])
+                entries.append(item)
+            # 処理済みの要素は解放してメモリを抑える
+            el.clear()
+    parser.close()
+    return entries
+
+
+def fetch_hatena_rss_entries(category="it"):
+    url = f"{HOTENTRY_BASE_URL}/{category}.rss"
+    # 受信しながらパースし、読み終えたらキャッシュに保存する（download_text と同じ）
+    response = http_client.get(url, stream=True)
+    with response:
+        response.raise_for_status()
+        store_cache = http_client.CACHE_ENABLED and not getattr(
+            response, "from_cache", False
+        )
+        raw_chunks = []
+
+        def chunks():
+            for chunk in response.iter_content(chunk_size=FEED_CHUNK_SIZE):
+                if store_cache:
+                    raw_chunks.append(chunk)
+                yield chunk
+
+        entries = parse_hatena_feed(chunks())
+
+    if store_cache:
+        http_client.get_cache().store(url, response, body=b"".join(raw_chunks))
+    return entries
+
+
+def fetch_hatena_news_entries(parser=None, category="it", use_rss=True):
+    """
+    ホットエントリーを取得する。use_rss=True の場合はまず軽量なRSSを読み、
+    失敗したときや空だったときだけHTMLをスクレイピングする。
+    """
+    if use_rss:
+        try:
+            entries = fetch_hatena_rss_entries(category)
+            if entries:
+                return entries
+            print("RSSにエントリーがありませんでした。HTMLから取得します。")
         except Exception as e:
-            attempt_count += 1
-            print(
-                f"fetchHatenaNewsEntries 内でエラーが発生しました (試行 {attempt_count}): {e}"
-            )
-            if attempt_count >= max_attempts:
-                print("最大試行回数に達しました。処理を中断します。")
-                raise
-            else:
-                print("再試行します...")
-                time.sleep(2)
+            print(f"RSSの取得に失敗しました。HTMLから取得します: {e}")
+
+    url = f"{HOTENTRY_BASE_URL}/{category}"
+    # リトライ・バックオフは http_client 側で行う
+    try:
+        response = http_client.get(url)
+        response.raise_for_status()
+        entries = parse_hatena_entries(response.text, parser=parser)
+        # print("entries件数:", len(entries))
+        # with open("hatena_debug.html", "w", encoding="utf-8") as f:
+        #     f.write(response.text)
+    except Exception as e:
+        print(f"fetchHatenaNewsEntries 内でエラーが発生しました: {e}")
+        raise
     return entries
 
 
-def fetch_article_content_from_url(url):
+def fetch_hatena_news_entries_by_category(categories=HATENA_CATEGORIES, parser=None):
+    """
+    複数カテゴリのホットエントリーを並列に取得し、{カテゴリ: エントリーリスト} を返す。
+    同じURLが複数カテゴリに載っている場合は categories の先に指定したカテゴリに残す。
+    取得に失敗したカテゴリは空リストになる。
+    """
+    categories = list(categories)
+    if not categories:
+        return {}
+
+    def fetch(category):
+        try:
+            return fetch_hatena_news_entries(parser=parser, category=category)
+        except Exception as e:
+            print(f"カテゴリ {category} の取得に失敗しました: {e}")
+            return []
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(FETCH_MAX_WORKERS, len(categories))
+    ) as executor:
+        fetched = list(executor.map(fetch, categories))
+
+    results = {}
+    seen = set()
+    for category, entries in zip(categories, fetched):
+        results[category] = []
+        for item in entries:
+            if item["url"] not in seen:
+                seen.add(item["url"])
+                results[category].append(item)
+    return results
+
+
+def fetch_article_html(url):
+    """
+    記事のHTMLをストリーミングで取得する。HTML以外（PDFなど）は読まずに ""、
+    巨大なページは http_client.MAX_DOWNLOAD_BYTES までで打ち切る。
+    """
     try:
-        response = requests.get(url, timeout=30, headers={"User-Agent": "Mozilla/5.0"})
-        if response.status_code != 200:
-            print(f"HTTPエラー: {response.status_code}")
-            return ""
-        html = response.text
-        article = extract(html, favor_precision=True)
-        return article if article else ""
+        return http_client.download_text(url)
+    except requests.HTTPError as e:
+        print(f"HTTPエラー: {e.response.status_code}")
+        return ""
     except Exception as e:
         print(f"エラー: {e}")
         return ""
+
+
+def _extract_cache_path(html):
+    key = hashlib.sha256(html.encode("utf-8")).hexdigest()
+    return os.path.join(EXTRACT_CACHE_DIR, key + ".txt")
+
+
+def _load_extract_cache(html):
+    path = _extract_cache_path(html)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        article = f.read()
+    # 更新日時を最終アクセスとして使う（prune_extract_cache で参照する）
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return article
+
+
+def prune_extract_cache(
+    ttl=EXTRACT_CACHE_TTL, max_bytes=EXTRACT_CACHE_MAX_BYTES, now=None
+):
+    """
+    抽出キャッシュから ttl 秒以上使われていないものを削除し、
+    残りが max_bytes を超える分は最終アクセスが古い順（LRU）に削除する。
+    削除したファイル数を返す。
+    """
+    if not os.path.isdir(EXTRACT_CACHE_DIR):
+        return 0
+    now = time.time() if now is None else now
+    files = []
+    for entry in os.scandir(EXTRACT_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith(".txt"):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if now - mtime < ttl and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def extract_article_text(html):
+    """
+    HTMLから本文を抽出する。結果はHTMLのハッシュをキーにキャッシュし、
+    同じ内容のページは再抽出しない（ProcessPoolExecutor のワーカーからも呼ばれる）。
+    """
+    if not html:
+        return ""
+    cached = _load_extract_cache(html)
+    if cached is not None:
+        return cached
+    # trafilatura は import が重いため、キャッシュに無いときだけ読み込む
+    from trafilatura import extract
+
+    try:
+        article = extract(html, favor_precision=True) or ""
+    except Exception as e:
+        print(f"エラー: {e}")
+        return ""
+    # 同じHTMLを複数のスレッドが同時に抽出しても一時ファイルが衝突しないようにする
+    path = _extract_cache_path(html)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(EXTRACT_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(article)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # キャッシュに書けなくても抽出した本文は返す
+        print(f"抽出キャッシュの保存に失敗しました: {e}")
+    return article
+
+
+def fetch_article_content_from_url(url):
+    return extract_article_text(fetch_article_html(url))
+
+
+def fetch_article_contents(urls, max_workers=FETCH_MAX_WORKERS, use_process_pool=False):
+    """
+    複数URLの記事本文を並列に取得し、urls と同じ順序で返す。
+    URLが空の場合や取得に失敗した場合は "" を返す。
+    use_process_pool=True の場合、本文抽出を ProcessPoolExecutor で行い、
+    取得できたページから順に抽出を始めるのでネットワーク待ちと抽出が重なる。
+    ただし spawn で起動する環境（Windows）ではワーカーごとに __main__ を import し直すため、
+    数十ページ程度ならスレッドで抽出する既定の方が速い（benchmark.py scrape で比較できる）。
+    """
+    if not urls:
+        return []
+    prune_extract_cache()
+    if not use_process_pool:
+
+        def fetch(url):
+            return fetch_article_content_from_url(url) if url else ""
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(max_workers, len(urls))
+        ) as executor:
+            return list(executor.map(fetch, urls))
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=EXTRACT_MAX_WORKERS
+    ) as extract_executor:
+
+        def fetch_and_submit(url):
+            html = fetch_article_html(url) if url else ""
+            if not html:
+                return ""
+            cached = _load_extract_cache(html)
+            if cached is not None:
+                return cached
+            return extract_executor.submit(extract_article_text, html)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(max_workers, len(urls))
+        ) as executor:
+            pending = list(executor.map(fetch_and_submit, urls))
+
+        results = []
+        for item in pending:
+            if isinstance(item, concurrent.futures.Future):
+                try:
+                    item = item.result()
+                except Exception as e:
+                    print(f"エラー: {e}")
+                    item = ""
+            results.append(item)
+        return results
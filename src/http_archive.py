@@ -0,0 +1,71 @@
+import os
+import json
+import base64
+import threading
+from datetime import datetime
+from typing import Optional
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# アーカイブの保存先（srcの一つ上の cache/archive）
+ARCHIVE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "cache", "archive", "http.jsonl"
+)
+
+
+class HttpArchive:
+    """
+    HTTP のやり取りを JSON Lines で記録・再生するアーカイブ。
+    1行が1レスポンス（url, status, headers, encoding, body(base64)）。
+    同じURLが複数回記録されている場合は最後の記録を再生する。
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = None
+
+    def _load(self):
+        records = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        records[record["url"]] = record
+        return records
+
+    def record(self, url: str, response: requests.Response):
+        record = {
+            "url": url,
+            "recorded_at": datetime.now().isoformat(),
+            "status": response.status_code,
+            "headers": dict(response.headers),
+            "encoding": response.encoding,
+            "body": base64.b64encode(response.content).decode("ascii"),
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if self._records is not None:
+                self._records[url] = record
+
+    def replay(self, url: str) -> Optional[requests.Response]:
+        """記録済みのレスポンスを返す。記録が無ければ None"""
+        with self._lock:
+            if self._records is None:
+                self._records = self._load()
+            record = self._records.get(url)
+        if record is None:
+            return None
+        response = requests.Response()
+        response.status_code = record["status"]
+        response.url = url
+        response._content = base64.b64decode(record["body"])
+        response._content_consumed = True
+        response.encoding = record["encoding"]
+        response.headers = CaseInsensitiveDict(record["headers"])
+        # 再生したレスポンスはキャッシュに書き戻さない
+        response.from_cache = True
+        return response
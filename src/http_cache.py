@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Optional, Dict, Any
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# キャッシュの保存先（srcの一つ上の cache/http）
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "http")
+# この秒数以内なら再検証せずにキャッシュをそのまま返す
+DEFAULT_TTL = 30 * 60
+# キャッシュ全体のサイズ上限（超えたら最終アクセスが古いものから削除）
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+# 保存しておくレスポンスヘッダ
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class HttpCache:
+    """
+    ETag / Last-Modified を保存し、条件付き GET で再検証するディスクキャッシュ。
+    index.json に URL ごとのメタ情報、本文は URL のハッシュ名のファイルに保存する。
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = MAX_CACHE_BYTES,
+    ):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"HTTPキャッシュのインデックス読み込みに失敗しました: {e}")
+            return {}
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def _body_path(self, url: str) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest()
+        )
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._index.get(url)
+            if entry and not os.path.exists(self._body_path(url)):
+                del self._index[url]
+                return None
+            return dict(entry) if entry else None
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["stored_at"] < self.ttl
+
+    def conditional_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """再検証用の If-None-Match / If-Modified-Since ヘッダを返す"""
+        headers = {}
+        stored = entry.get("headers", {})
+        if stored.get("ETag"):
+            headers["If-None-Match"] = stored["ETag"]
+        if stored.get("Last-Modified"):
+            headers["If-Modified-Since"] = stored["Last-Modified"]
+        return headers
+
+    def to_response(self, url: str, entry: Dict[str, Any]) -> requests.Response:
+        """キャッシュ済みの本文から requests.Response を組み立てる"""
+        with open(self._body_path(url), "rb") as f:
+            body = f.read()
+        with self._lock:
+            if url in self._index:
+                self._index[url]["last_access"] = time.time()
+                self._save_index()
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body
+        response._content_consumed = True
+        response.encoding = entry.get("encoding")
+        response.headers = CaseInsensitiveDict(entry.get("headers", {}))
+        response.from_cache = True
+        return response
+
+    def refresh(self, url: str):
+        """304 を受け取ったときに保存時刻を更新する"""
+        with self._lock:
+            if url in self._index:
+                now = time.time()
+                self._index[url]["stored_at"] = now
+                self._index[url]["last_access"] = now
+                self._save_index()
+
+    def store(self, url: str, response: requests.Response, body: bytes = None):
+        """
+        200 のレスポンスを保存する。ストリーミングで読み終えた場合は本文を body で渡す。
+        """
+        if response.status_code != 200:
+            return
+        if body is None:
+            body = response.content
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock:
+            with open(self._body_path(url), "wb") as f:
+                f.write(body)
+            now = time.time()
+            self._index[url] = {
+                "stored_at": now,
+                "last_access": now,
+                "size": len(body),
+                "encoding": response.encoding,
+                "headers": {
+                    key: response.headers[key]
+                    for key in STORED_HEADERS
+                    if key in response.headers
+                },
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        """サイズ上限を超えた分を最終アクセスが古い順（LRU）に削除する"""
+        total = sum(entry["size"] for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(
+            self._index.items(), key=lambda item: item[1]["last_access"]
+        ):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._body_path(url))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            del self._index[url]
+
+    def clear(self):
+        with self._lock:
+            for url in list(self._index):
+                try:
+                    os.remove(self._body_path(url))
+                except FileNotFoundError:
+                    pass
+            self._index = {}
+            self._save_index()
@@ -0,0 +1,374 @@
+import os
+import re
+import time
+import codecs
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from http_cache import HttpCache
+import http_archive
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+DEFAULT_TIMEOUT = 30
+# コネクションプールの設定（ホスト数 / 1ホストあたりの keep-alive 接続数）
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 8
+# 1ホストあたりの同時リクエスト数の上限
+PER_HOST_LIMIT = 4
+# リトライ設定（指数バックオフ + ジッター）
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+# 1リクエストあたりの全体の締め切り（リトライ・待ち時間を含む秒数）
+DEFAULT_DEADLINE = 120
+# ホストごとのトークンバケット（毎秒の補充数 / 最大トークン数）
+HOST_RATE = 2.0
+HOST_BURST = 4
+# ストリーミングダウンロードの上限バイト数とチャンクサイズ
+MAX_DOWNLOAD_BYTES = 5 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# 本文として読み込む Content-Type
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+# Content-Type が曖昧なときに先頭バイトで判定する
+SNIFF_BYTES = 1024
+HTML_SIGNATURES = (b"<!doctype html", b"<html", b"<head", b"<body")
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.IGNORECASE)
+# HTTP アーカイブのモード（"record" / "replay" / ""）と保存先
+ARCHIVE_MODE = os.getenv("HTTP_ARCHIVE_MODE", "").lower()
+ARCHIVE_PATH = os.getenv("HTTP_ARCHIVE_PATH") or http_archive.ARCHIVE_PATH
+# ディスクキャッシュ（条件付き GET）を使うかどうか
+CACHE_ENABLED = True
+
+_session = None
+_session_lock = threading.Lock()
+_host_semaphores = {}
+_host_lock = threading.Lock()
+_host_buckets = {}
+_cache = None
+_archive = None
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """リトライや待ち時間を含めて締め切りを過ぎた"""
+
+
+class TokenBucket:
+    """rate 個/秒 で補充され、最大 capacity 個まで貯まるトークンバケット"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline_at: float = None):
+        """トークンを1つ取得する。deadline_at（monotonic）までに取れなければ例外"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if deadline_at is not None and now + wait > deadline_at:
+                raise DeadlineExceeded("レート制限の待ち時間が締め切りを超えました")
+            time.sleep(wait)
+
+
+def get_session() -> requests.Session:
+    """プロセス内で共有する keep-alive 付きの Session を返す"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with _host_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(PER_HOST_LIMIT)
+            _host_semaphores[host] = semaphore
+    return semaphore
+
+
+def _host_bucket(url: str) -> TokenBucket:
+    host = urlparse(url).netloc
+    with _host_lock:
+        bucket = _host_buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(HOST_RATE, HOST_BURST)
+            _host_buckets[host] = bucket
+    return bucket
+
+
+def _backoff(attempt: int) -> float:
+    """full jitter の指数バックオフ"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2**attempt)))
+
+
+def _retry_after(response: requests.Response):
+    """Retry-After ヘッダ（秒数 / HTTP-date）を秒数で返す。無ければ None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def get_cache() -> HttpCache:
+    global _cache
+    if _cache is None:
+        with _session_lock:
+            if _cache is None:
+                _cache = HttpCache()
+    return _cache
+
+
+def get_archive() -> http_archive.HttpArchive:
+    global _archive
+    if _archive is None:
+        with _session_lock:
+            if _archive is None:
+                _archive = http_archive.HttpArchive(ARCHIVE_PATH)
+    return _archive
+
+
+def set_archive_mode(mode: str, path: str = None):
+    """
+    アーカイブのモードを切り替える。
+    mode: "record"（やり取りを記録）/ "replay"（記録から再生）/ ""（無効）
+    """
+    global ARCHIVE_MODE, ARCHIVE_PATH, _archive
+    if mode not in ("record", "replay", ""):
+        raise ValueError(f"Unknown archive mode: {mode}")
+    ARCHIVE_MODE = mode
+    if path:
+        ARCHIVE_PATH = path
+    _archive = None
+
+
+def _send(
+    url: str, timeout: float, deadline: float = None, **kwargs
+) -> requests.Response:
+    """
+    ホストごとのトークンバケットと同時接続数の制限を守って GET する。
+    接続エラーや 429/5xx は Retry-After か指数バックオフで待ってリトライし、
+    deadline 秒を超える場合はそれ以上待たない。
+    """
+    deadline_at = time.monotonic() + (
+        deadline if deadline is not None else DEFAULT_DEADLINE
+    )
+    attempt = 0
+    while True:
+        _host_bucket(url).acquire(deadline_at)
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"締め切りを過ぎました: {url}")
+        try:
+            with _host_semaphore(url):
+                response = get_session().get(
+                    url, timeout=min(timeout, remaining), **kwargs
+                )
+        except RETRY_EXCEPTIONS as e:
+            wait = _backoff(attempt)
+            if attempt >= MAX_RETRIES or time.monotonic() + wait >= deadline_at:
+                raise
+            print(f"リクエストを再試行します ({attempt + 1}/{MAX_RETRIES}): {url} {e}")
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            wait = _retry_after(response)
+            if wait is None:
+                wait = _backoff(attempt)
+            if attempt >= MAX_RETRIES or time.monotonic() + wait >= deadline_at:
+                return response
+            print(
+                f"リクエストを再試行します ({attempt + 1}/{MAX_RETRIES}): {url} HTTP {response.status_code}"
+            )
+            response.close()
+        attempt += 1
+        time.sleep(wait)
+
+
+def get(
+    url: str,
+    timeout: float = DEFAULT_TIMEOUT,
+    use_cache: bool = None,
+    deadline: float = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    共有 Session で GET する（ホストごとのレート制限・同時接続数制限・リトライ付き）。
+    キャッシュ有効時は TTL 内ならキャッシュを返し、期限切れなら条件付き GET で再検証する。
+    ARCHIVE_MODE が "replay" ならアーカイブから返し、"record" ならやり取りを記録する。
+    """
+    if ARCHIVE_MODE == "replay":
+        response = get_archive().replay(url)
+        if response is None:
+            print(f"アーカイブに記録がありません: {url}")
+            response = requests.Response()
+            response.status_code = 404
+            response.url = url
+            response._content = b""
+            response._content_consumed = True
+            response.from_cache = True
+        return response
+    if ARCHIVE_MODE == "record":
+        # 本文を丸ごと記録するため、ストリーミング指定でも一括で読む
+        kwargs["stream"] = False
+        response = _get(url, timeout, use_cache, deadline, **kwargs)
+        get_archive().record(url, response)
+        # キャッシュへの保存は _get で済んでいる
+        response.from_cache = True
+        return response
+    return _get(url, timeout, use_cache, deadline, **kwargs)
+
+
+def _get(
+    url: str, timeout: float, use_cache: bool, deadline: float, **kwargs
+) -> requests.Response:
+    if use_cache is None:
+        use_cache = CACHE_ENABLED
+    if not use_cache:
+        return _send(url, timeout, deadline=deadline, **kwargs)
+
+    cache = get_cache()
+    entry = cache.lookup(url)
+    if entry and cache.is_fresh(entry):
+        return cache.to_response(url, entry)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry:
+        headers.update(cache.conditional_headers(entry))
+    response = _send(url, timeout, deadline=deadline, headers=headers, **kwargs)
+    if entry and response.status_code == 304:
+        cache.refresh(url)
+        return cache.to_response(url, entry)
+    if kwargs.get("stream"):
+        # ストリーミング時は読み終えた側（download_text など）が保存する
+        return response
+    cache.store(url, response)
+    return response
+
+
+def _sniff_is_html(head: bytes) -> bool:
+    lowered = head[:SNIFF_BYTES].lstrip().lower()
+    if b"\x00" in lowered:
+        return False
+    return any(signature in lowered for signature in HTML_SIGNATURES)
+
+
+def _detect_encoding(response: requests.Response, head: bytes) -> str:
+    """ヘッダの charset → meta タグの charset → utf-8 の順で文字コードを決める"""
+    if "charset" in response.headers.get("Content-Type", "").lower():
+        encoding = response.encoding
+    else:
+        match = META_CHARSET_RE.search(head[:SNIFF_BYTES])
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = "utf-8"
+    return encoding
+
+
+def download_text(
+    url: str,
+    max_bytes: int = None,
+    content_types=HTML_CONTENT_TYPES,
+    **kwargs,
+) -> str:
+    """
+    レスポンスをストリーミングで読み、逐次デコードしたテキストを返す。
+    - Content-Type（曖昧なときは先頭バイト）が content_types 以外なら読まずに "" を返す
+    - max_bytes（未指定なら MAX_DOWNLOAD_BYTES）に達したらそこで読み込みをやめる（途中までのテキストを返す）
+    200 以外のステータスは requests.HTTPError を送出する。
+    """
+    if max_bytes is None:
+        max_bytes = MAX_DOWNLOAD_BYTES
+    response = get(url, stream=True, **kwargs)
+    with response:
+        if response.status_code != 200:
+            raise requests.HTTPError(
+                f"HTTP {response.status_code}: {url}", response=response
+            )
+        content_type = (
+            response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        )
+        chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+        head = next(chunks, b"")
+        if content_type not in content_types:
+            if content_type.startswith("text/") or content_type in (
+                "",
+                "application/octet-stream",
+            ):
+                is_html = _sniff_is_html(head)
+            else:
+                is_html = False
+            if not is_html:
+                print(f"HTML以外のため取得をスキップします ({content_type}): {url}")
+                return ""
+
+        decoder = codecs.getincrementaldecoder(_detect_encoding(response, head))(
+            errors="replace"
+        )
+        use_cache = kwargs.get("use_cache")
+        store_cache = (
+            CACHE_ENABLED if use_cache is None else use_cache
+        ) and not getattr(response, "from_cache", False)
+        raw_chunks = []
+        parts = []
+        received = 0
+        truncated = False
+        chunk = head
+        while chunk:
+            if received + len(chunk) > max_bytes:
+                chunk = chunk[: max_bytes - received]
+                truncated = True
+            received += len(chunk)
+            parts.append(decoder.decode(chunk))
+            if store_cache:
+                raw_chunks.append(chunk)
+            if truncated:
+                print(f"{max_bytes} バイトに達したため読み込みを打ち切りました: {url}")
+                break
+            chunk = next(chunks, b"")
+        parts.append(decoder.decode(b"", final=True))
+        text = "".join(parts)
+
+    if store_cache and not truncated:
+        get_cache().store(url, response, body=b"".join(raw_chunks))
+    return text
@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Optional, Dict, Any
+
+# キャッシュDBの保存先（srcの一つ上の cache/llm_cache.sqlite3）
+CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "cache", "llm_cache.sqlite3"
+)
+# キャッシュの有効期限（秒）
+DEFAULT_TTL = 7 * 24 * 60 * 60
+# 保持する最大件数（超えたら最終アクセスが古いものから削除）
+MAX_ENTRIES = 5000
+
+
+def make_key(provider: str, model: str, params: Dict[str, Any], prompt: str) -> str:
+    """provider / model / パラメータ / プロンプトからキャッシュキーを作る"""
+    payload = json.dumps(
+        {"provider": provider, "model": model, "params": params, "prompt": prompt},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LlmCache:
+    """
+    プロンプトと応答を SQLite に保存する永続キャッシュ。
+    TTL を過ぎたものは参照時に無視し、件数が MAX_ENTRIES を超えたら LRU で削除する。
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = MAX_ENTRIES,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT,
+                model TEXT,
+                response TEXT,
+                created_at REAL,
+                last_access REAL
+            )""")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, response: str, provider: str = "", model: str = ""):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+        )
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access LIMIT ?
+                )""",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+
+# 計測レポートの保存先（srcの一つ上の history/metrics）
+METRICS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "history", "metrics"
+)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LLM呼び出しごとに provider / model / トークン数 / 最初のトークンまでの時間 /
+    全体のレイテンシ / ヘッジ・フェイルオーバーの有無 / 呼び出し元ワークフローを記録するコールバック。
+    SDK 内部のリトライはコールバックに通知されないため、別プロバイダへのやり直し
+    （ResilientChatModel の hedged / failover）だけを数える。
+    最初のトークンまでの時間（ttft）は on_llm_new_token が呼ばれるストリーミング時だけ記録し、
+    ストリーミングしない呼び出しでは None にする。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running: Dict[UUID, Dict[str, Any]] = {}
+        self.records: List[Dict[str, Any]] = []
+        self.hooks: List[Callable[[Dict[str, Any]], None]] = []
+
+    def _start(self, serialized, run_id, metadata):
+        metadata = metadata or {}
+        kwargs = (serialized or {}).get("kwargs", {})
+        with self._lock:
+            self._running[run_id] = {
+                "provider": metadata.get("ls_provider", ""),
+                "model": metadata.get("ls_model_name")
+                or kwargs.get("model")
+                or kwargs.get("model_name", ""),
+                "workflow": metadata.get("workflow", ""),
+                "started_at": datetime.now().isoformat(),
+                "start": time.perf_counter(),
+                "first_token": None,
+                "hedged": False,
+                "failover": False,
+            }
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, metadata=None, **kwargs
+    ):
+        self._start(serialized, run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(serialized, run_id, metadata)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            running = self._running.get(run_id)
+            if running and running["first_token"] is None:
+                running["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        # ヘッジ・フェイルオーバー時は実際に応答したプロバイダで記録する
+        served = response.llm_output or {}
+        with self._lock:
+            running = self._running.get(run_id)
+            if running and served.get("provider"):
+                running["provider"] = served["provider"]
+                running["model"] = served.get("model", running["model"])
+            if running:
+                running["hedged"] = bool(served.get("hedged"))
+                running["failover"] = bool(served.get("failover"))
+        prompt_tokens, completion_tokens = _token_usage(response)
+        self._finish(run_id, prompt_tokens, completion_tokens, None)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, 0, 0, f"{type(error).__name__}: {error}")
+
+    def _finish(self, run_id, prompt_tokens, completion_tokens, error):
+        end = time.perf_counter()
+        with self._lock:
+            running = self._running.pop(run_id, None)
+        if running is None:
+            return
+        start = running.pop("start")
+        first_token = running.pop("first_token")
+        record = {
+            **running,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "ttft": first_token - start if first_token is not None else None,
+            "latency": end - start,
+            "error": error,
+        }
+        with self._lock:
+            self.records.append(record)
+            hooks = list(self.hooks)
+        for hook in hooks:
+            try:
+                hook(record)
+            except Exception as e:
+                print(f"計測フックでエラーが発生しました: {e}")
+
+
+def _token_usage(response):
+    """LLMResult から (プロンプトトークン数, 出力トークン数) を取り出す"""
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+    if not prompt_tokens and not completion_tokens:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+_handler = MetricsCallbackHandler()
+
+
+def get_handler() -> MetricsCallbackHandler:
+    return _handler
+
+
+def add_hook(hook: Callable[[Dict[str, Any]], None]):
+    """LLM呼び出しが終わるたびに記録（辞書）を受け取る関数を登録する"""
+    with _handler._lock:
+        _handler.hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[Dict[str, Any]], None]):
+    with _handler._lock:
+        _handler.hooks.remove(hook)
+
+
+def get_records() -> List[Dict[str, Any]]:
+    with _handler._lock:
+        return list(_handler.records)
+
+
+def reset():
+    with _handler._lock:
+        _handler.records.clear()
+
+
+def summarize(records: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    provider / model / workflow ごとの呼び出し数・トークン数・レイテンシを集計する。
+    ttft_total はストリーミングした呼び出し（streamed 件）だけの合計。
+    """
+    records = get_records() if records is None else records
+    groups: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        key = f"{record['provider']}/{record['model']}/{record['workflow']}"
+        group = groups.setdefault(
+            key,
+            {
+                "provider": record["provider"],
+                "model": record["model"],
+                "workflow": record["workflow"],
+                "calls": 0,
+                "errors": 0,
+                "hedged": 0,
+                "failovers": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "latency_total": 0.0,
+                "latency_max": 0.0,
+                "streamed": 0,
+                "ttft_total": 0.0,
+            },
+        )
+        group["calls"] += 1
+        group["errors"] += 1 if record["error"] else 0
+        group["hedged"] += 1 if record["hedged"] else 0
+        group["failovers"] += 1 if record["failover"] else 0
+        group["prompt_tokens"] += record["prompt_tokens"]
+        group["completion_tokens"] += record["completion_tokens"]
+        group["latency_total"] += record["latency"]
+        group["latency_max"] = max(group["latency_max"], record["latency"])
+        if record["ttft"] is not None:
+            group["streamed"] += 1
+            group["ttft_total"] += record["ttft"]
+    return groups
+
+
+def _prometheus_text(groups: Dict[str, Dict[str, Any]]) -> str:
+    metrics = [
+        ("llm_calls_total", "calls", "counter"),
+        ("llm_errors_total", "errors", "counter"),
+        ("llm_hedged_total", "hedged", "counter"),
+        ("llm_failovers_total", "failovers", "counter"),
+        ("llm_prompt_tokens_total", "prompt_tokens", "counter"),
+        ("llm_completion_tokens_total", "completion_tokens", "counter"),
+        ("llm_latency_seconds_total", "latency_total", "counter"),
+        ("llm_latency_seconds_max", "latency_max", "gauge"),
+        ("llm_streamed_calls_total", "streamed", "counter"),
+        ("llm_ttft_seconds_total", "ttft_total", "counter"),
+    ]
+    lines = []
+    for name, field, metric_type in metrics:
+        lines.append(f"# TYPE {name} {metric_type}")
+        for group in groups.values():
+            labels = ",".join(
+                f'{label}="{str(group[label]).replace(chr(34), "")}"'
+                for label in ("provider", "model", "workflow")
+            )
+            lines.append(f"{name}{{{labels}}} {group[field]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_report(name: str, directory: str = METRICS_DIR) -> str:
+    """
+    今回の実行の計測結果を <name>.json（全呼び出しと集計）と
+    <name>.prom（Prometheus textfile 形式の集計）に保存し、JSONのパスを返す。
+    """
+    os.makedirs(directory, exist_ok=True)
+    records = get_records()
+    groups = summarize(records)
+    json_path = os.path.join(directory, f"{name}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"calls": records, "summary": list(groups.values())},
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    with open(os.path.join(directory, f"{name}.prom"), "w", encoding="utf-8") as f:
+        f.write(_prometheus_text(groups))
+    return json_path
+
+
+def run_name(prefix: str, now: Optional[datetime] = None) -> str:
+    """レポート名（<prefix>_YYYY_MM_DD_HH_MM）を返す"""
+    now = now or datetime.now()
+    return f"{prefix}_{now.year}_{now.month:02d}_{now.day:02d}_{now.hour:02d}_{now.minute:02d}"
+
+
+def save_report(name: str):
+    """
+    write_report を呼んでパスを表示する。実行の finally から呼ぶ想定で、
+    保存に失敗しても例外は出さない（元の例外を隠さないため）。
+    """
+    try:
+        print(f"LLM計測レポート: {write_report(name)}")
+    except Exception as e:
+        print(f"LLM計測レポートの保存に失敗しました: {e}")
@@ -0,0 +1,192 @@
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from article_preprocess import estimate_tokens
+
+# プロバイダごとの 1分あたりのリクエスト数 / トークン数（無料枠を基準にした既定値）
+# 有料プランなどで上限が異なる場合は set_limit() で変更する
+DEFAULT_LIMITS = {
+    "gemini": {"rpm": 15, "tpm": 1_000_000},
+    "openai": {"rpm": 500, "tpm": 200_000},
+}
+FALLBACK_LIMIT = {"rpm": 60, "tpm": 100_000}
+# 呼び出し前に見込む出力トークン数（終了後に実際の使用量で精算する）
+EXPECTED_COMPLETION_TOKENS = 1000
+
+
+class RateBudget:
+    """
+    1分あたりのリクエスト数とトークン数の2つのトークンバケット。
+    トークンは呼び出し前に見込みで引き、終了後に実際の使用量との差を精算する
+    （使いすぎた分は次の呼び出しの待ち時間になる）。
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = rpm
+        self.tokens = tpm
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+        self.updated = now
+
+    def _try_acquire(self, tokens: int) -> float:
+        """取得できれば 0、できなければ待つべき秒数を返す"""
+        # 1回で上限を超える見込みのリクエストも、満タンになれば通す
+        tokens = min(tokens, self.tpm)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.requests >= 1 and self.tokens >= tokens:
+                self.requests -= 1
+                self.tokens -= tokens
+                self.calls += 1
+                return 0.0
+            wait_requests = max(0.0, (1 - self.requests) * 60 / self.rpm)
+            wait_tokens = max(0.0, (tokens - self.tokens) * 60 / self.tpm)
+            return max(wait_requests, wait_tokens, 0.01)
+
+    def acquire(self, tokens: int):
+        """予算が空くまで待ってからリクエスト1回と tokens を引く"""
+        start = time.monotonic()
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                break
+            time.sleep(wait)
+        with self._lock:
+            self.waited += time.monotonic() - start
+
+    def settle(self, estimated: int, actual: int):
+        """見込みで引いたトークン数を実際の使用量に合わせる"""
+        with self._lock:
+            self.tokens = min(self.tpm, self.tokens + estimated - actual)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "calls": self.calls,
+                "waited": round(self.waited, 3),
+            }
+
+
+class RateScheduler:
+    """provider / model ごとの RateBudget を管理する"""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.limits = {k: dict(v) for k, v in (limits or DEFAULT_LIMITS).items()}
+        self._budgets: Dict[Tuple[str, str], RateBudget] = {}
+        self._lock = threading.Lock()
+
+    def set_limit(
+        self,
+        provider: str,
+        model: str = None,
+        rpm: float = None,
+        tpm: float = None,
+    ):
+        """provider（model 指定時はそのモデルだけ）の上限を変更する"""
+        key = f"{provider}/{model}" if model else provider
+        limit = self.limits.setdefault(key, dict(self._limit_for(provider, model)))
+        if rpm is not None:
+            limit["rpm"] = rpm
+        if tpm is not None:
+            limit["tpm"] = tpm
+        with self._lock:
+            for (p, m), budget in self._budgets.items():
+                if p == provider and (model is None or m == model):
+                    current = self._limit_for(p, m)
+                    budget.rpm, budget.tpm = current["rpm"], current["tpm"]
+
+    def _limit_for(self, provider: str, model: str) -> Dict[str, float]:
+        return (
+            self.limits.get(f"{provider}/{model}")
+            or self.limits.get(provider)
+            or FALLBACK_LIMIT
+        )
+
+    def budget(self, provider: str, model: str) -> RateBudget:
+        with self._lock:
+            budget = self._budgets.get((provider, model))
+            if budget is None:
+                limit = self._limit_for(provider, model)
+                budget = RateBudget(limit["rpm"], limit["tpm"])
+                self._budgets[(provider, model)] = budget
+            return budget
+
+    def handler(self, provider: str, model: str) -> "RateLimitCallbackHandler":
+        return RateLimitCallbackHandler(self.budget(provider, model))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            budgets = list(self._budgets.items())
+        return {f"{p}/{m}": budget.stats() for (p, m), budget in budgets}
+
+
+class RateLimitCallbackHandler(BaseCallbackHandler):
+    """
+    モデルに付けておくと、呼び出し開始時に予算が空くまで待たせ、
+    終了時に実際のトークン使用量で精算する。
+    invoke / batch / 非同期（同期ハンドラは別スレッドで実行される）のどれでも通る。
+    """
+
+    def __init__(self, budget: RateBudget):
+        self.budget = budget
+        self._estimates: Dict[UUID, int] = {}
+        self._listeners: List[Callable[[UUID], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[UUID], None]):
+        """予算を取得して呼び出しを始めるときに、その run_id を受け取る関数を登録する"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt = "".join(
+            m.content if isinstance(m.content, str) else str(m.content)
+            for batch in messages
+            for m in batch
+        )
+        self._start(run_id, estimate_tokens(prompt))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, estimate_tokens("".join(prompts)))
+
+    def _start(self, run_id, prompt_tokens: int):
+        estimated = prompt_tokens + EXPECTED_COMPLETION_TOKENS
+        self.budget.acquire(estimated)
+        with self._lock:
+            self._estimates[run_id] = estimated
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            estimated = self._estimates.pop(run_id, None)
+        if estimated is None:
+            return
+        actual = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage:
+                    actual += usage.get("total_tokens", 0)
+        if actual:
+            self.budget.settle(estimated, actual)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._estimates.pop(run_id, None)
@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import zlib
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+# MinHash の署名長と LSH のバンド分割（BANDS * ROWS = NUM_PERM）
+# 16バンド×4行だと推定 Jaccard 係数がおよそ 0.5 以上の組が候補になる
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# 候補のうち、署名から推定した Jaccard 係数がこれ以上なら重複とみなす
+DEFAULT_THRESHOLD = 0.5
+# 文字 n-gram の長さ（日本語は単語に区切らず文字単位で見る）
+SHINGLE_SIZE = 3
+# 本文はリード部分だけ使う（同じ発表の記事は冒頭が似ていることが多い）
+BODY_CHARS = 2000
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# 実行ごとに同じ署名になるよう固定の係数を使う
+_PERMUTATIONS = [
+    (
+        zlib.crc32(f"a{i}".encode()) * 2654435761 % _PRIME | 1,
+        zlib.crc32(f"b{i}".encode()) * 40503 % _PRIME,
+    )
+    for i in range(NUM_PERM)
+]
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return re.sub(r"[\s\W_]+", "", text)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    text = normalize(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(text: str) -> List[int]:
+    """文字 n-gram 集合の MinHash 署名を返す"""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERM
+    return [
+        min((a * h + b) % _PRIME & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS
+    ]
+
+
+def similarity(sig1: List[int], sig2: List[int]) -> float:
+    """署名から Jaccard 係数を推定する"""
+    return sum(1 for x, y in zip(sig1, sig2) if x == y) / NUM_PERM
+
+
+def document_text(title: str, body: str = "") -> str:
+    return f"{title}\n{(body or '')[:BODY_CHARS]}"
+
+
+class NearDuplicateIndex:
+    """
+    MinHash 署名を LSH（バンド分割）で引けるようにした近似重複インデックス。
+    path を指定すると署名を JSON に保存し、次回の実行（週内の別の日）でも使える。
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, threshold: float = DEFAULT_THRESHOLD
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.entries: List[Dict] = []
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for entry in json.load(f):
+                    self._add(entry)
+
+    def _bands(self, signature: List[int]):
+        for band in range(BANDS):
+            yield band, tuple(signature[band * ROWS : (band + 1) * ROWS])
+
+    def _add(self, entry: Dict):
+        index = len(self.entries)
+        self.entries.append(entry)
+        for band in self._bands(entry["signature"]):
+            self._buckets.setdefault(band, []).append(index)
+
+    def query(self, signature: List[int]) -> Optional[Dict]:
+        """最も似ている登録済みの記事（threshold 未満なら None）を返す"""
+        candidates = set()
+        for band in self._bands(signature):
+            candidates.update(self._buckets.get(band, ()))
+        best, best_score = None, self.threshold
+        for index in candidates:
+            score = similarity(signature, self.entries[index]["signature"])
+            if score >= best_score:
+                best, best_score = self.entries[index], score
+        return best
+
+    def add(self, url: str, title: str, signature: List[int]):
+        self._add({"url": url, "title": title, "signature": signature})
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+
+
+def dedupe_entries(
+    entries: List[Dict],
+    bodies: List[str],
+    index: NearDuplicateIndex,
+    limit: Optional[int] = None,
+) -> Tuple[List[int], List[Tuple[int, Dict]]]:
+    """
+    entries（ランキング順）を近似重複ごとにまとめ、各クラスタの先頭（最上位）だけを残す。
+    index に登録済みの記事（同じ週の過去の実行分）と似ているものも除く。
+    残した記事は index に追加する（保存は index.save() で行う）。
+    本文が空の記事（有料記事や取得失敗）はタイトルだけでは別の記事とも似てしまうため、
+    重複の判定をせずに残し、index にも追加しない。
+    戻り値は (残した entries のインデックス, [(除いたインデックス, 似ていた記事)])。
+    """
+    kept: List[int] = []
+    skipped: List[Tuple[int, Dict]] = []
+    for i, (item, body) in enumerate(zip(entries, bodies)):
+        if limit is not None and len(kept) >= limit:
+            break
+        if not (body or "").strip():
+            kept.append(i)
+            continue
+        signature = minhash(document_text(item["title"], body))
+        match = index.query(signature)
+        if match is not None:
+            skipped.append((i, match))
+            continue
+        index.add(item.get("url", ""), item["title"], signature)
+        kept.append(i)
+    return kept, skipped
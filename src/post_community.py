@@ -1,8 +1,8 @@
 import os
 import asyncio
-from playwright.async_api import async_playwright
 from dotenv import load_dotenv
-from utils import simple
+from utils import asimple
+import llm_metrics
 import random
 
 load_dotenv()
@@ -119,10 +119,11 @@ async def get_post_text():
         f"""「フォローよろしくお願いします🙇‍♀️必ずフォロバします！✨」\nのような文を人気女性ブロガーが作成したような文章で全角50文字程度で作成してください。
 先頭や文末に～をまとめましたや記号・改行、ハッシュタグなどの情報は不要です。""",
     )
-    results = simple(
+    results = await asimple(
         topic=topic,
         provider="openai",
         model="gpt-4o-mini",
+        use_cache=False,
     )
     summary = results[0]
     print(summary)
@@ -135,10 +136,11 @@ async def get_post_texts():
         f"""「フォローよろしくお願いします🙇‍♀️必ずフォロバします！✨」\nと同じ意味のような1行の文を人気女性ブロガーが作成したような文章で全角50文字程度で{len(COMMUNITY_URLS)}個作成して改行区切りで教えてください。
 先頭や文末に～をまとめました、ハッシュタグなどの余計な情報は不要です。""",
     )
-    results = simple(
+    results = await asimple(
         topic=topic,
         provider="openai",
         model="gpt-4o-mini",
+        use_cache=False,
     )
     summary = results[0]
     summary_list = [line.strip() for line in summary.split("\n") if line.strip()]
@@ -149,6 +151,9 @@ async def get_post_texts():
 
 
 async def main(headless=False):
+    # playwright は import が重いため、ブラウザを使うときに読み込む
+    from playwright.async_api import async_playwright
+
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=headless)
         context = await browser.new_context()
@@ -164,4 +169,7 @@ async def main(headless=False):
 if __name__ == "__main__":
     # asyncio.run(get_post_texts())
     # asyncio.run(get_post_text())
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        llm_metrics.save_report(llm_metrics.run_name("community"))
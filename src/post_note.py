@@ -1,14 +1,13 @@
 import os
 import asyncio
-from playwright.async_api import async_playwright
 from dotenv import load_dotenv
 from datetime import datetime
 import urllib.parse
-from utils import simple, question
+from utils import asimple, aquestion
+import llm_metrics
 import random
 import sys
 import re
-from screeninfo import get_monitors
 
 load_dotenv()
 EMAIL = os.getenv("NOTE_EMAIL")
@@ -248,7 +247,7 @@ async def click_random_buttons(
 
 async def like_on_note_topic_ai(page, is_suki=True, is_follow=False):
     tasks = []
-    search_word = random_search_word()
+    search_word = await random_search_word()
     encoded_search = urllib.parse.quote(search_word)
 
     if is_suki:
@@ -287,10 +286,14 @@ async def like_on_note_topic_ai(page, is_suki=True, is_follow=False):
 
 async def main(markdown_path, headless=False, publish=True):
 
+    # playwright は import が重いため、ブラウザを使うときに読み込む
+    from playwright.async_api import async_playwright
+
     title, body, hashtags = parse_markdown(markdown_path)
 
     async with async_playwright() as p:
         # browser = await p.chromium.launch(headless=headless, args=["--start-maximized"])
+        # from screeninfo import get_monitors
         # primary_monitor = get_monitors()[0]  # プライマリモニターを取得
         # context = await browser.new_context(
         #     viewport={"width": primary_monitor.width, "height": primary_monitor.height}
@@ -410,7 +413,7 @@ async def main(markdown_path, headless=False, publish=True):
             await wait_and_click(page, "投稿する")
             print("記事の投稿が完了しました")
 
-            results = simple(
+            results = await asimple(
                 topic=f"""記事の内容からtwitterで目を引くようにトレンドに沿って刺激的な80文字以内の1文のつぶやきにしてください。
 先頭や文末に～をまとめましたや改行などの情報は不要です。
 
@@ -429,10 +432,12 @@ async def main(markdown_path, headless=False, publish=True):
         await browser.close()
 
 
-def random_search_word():
+async def random_search_word():
     try:
-        search_word = question(
-            "IT関連において、ユーザーを探すためのキーワードを配列のみ教えてください。回答例：['IT', 'React', 'フロントエンド', ...]"
+        # 毎回違うキーワードが欲しいのでキャッシュは使わない
+        search_word = await aquestion(
+            "IT関連において、ユーザーを探すためのキーワードを配列のみ教えてください。回答例：['IT', 'React', 'フロントエンド', ...]",
+            use_cache=False,
         )
 
         # シングルクォーテーションで囲まれた文字列を抽出
@@ -448,4 +453,8 @@ def random_search_word():
 
 if __name__ == "__main__":
     markdown_path = sys.argv[1] if len(sys.argv) > 1 else MARKDOWN_PATH
-    asyncio.run(main(markdown_path))
+    try:
+        asyncio.run(main(markdown_path))
+    finally:
+        # 単体で実行したときも LLM呼び出しの計測結果を history/metrics に保存する
+        llm_metrics.save_report(llm_metrics.run_name("note"))
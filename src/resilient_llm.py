@@ -0,0 +1,338 @@
+import time
+import uuid
+import asyncio
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from pydantic import PrivateAttr
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+# プライマリの応答がこのパーセンタイルの時間を超えたらセカンダリにもヘッジリクエストを送る
+HEDGE_PERCENTILE = 0.9
+# パーセンタイルを計算するために保持する直近のレイテンシ件数
+LATENCY_WINDOW = 50
+# 計測値がこの件数に満たない間は HEDGE_INITIAL_DELAY（秒）を使う
+MIN_SAMPLES = 5
+HEDGE_INITIAL_DELAY = 15.0
+# ヘッジまでの待ち時間の下限（秒）。極端に短い値でヘッジが多発しないようにする
+HEDGE_MIN_DELAY = 2.0
+# フェイルオーバーする HTTP ステータス
+FAILOVER_STATUSES = {429, 500, 502, 503, 504}
+FAILOVER_MARKERS = ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "Too Many Requests", "429")
+# プライマリの送信開始を待つ間、プライマリが先に終わっていないかを確認する間隔（秒）
+START_POLL_INTERVAL = 0.05
+
+
+class FailoverError(Exception):
+    """フェイルオーバーする例外（429 / 5xx）を包んだもの。元の例外は __cause__ に入る"""
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """例外（原因の例外を含む）から HTTP ステータスを取り出す"""
+    while error is not None:
+        for attr in ("status_code", "code"):
+            value = getattr(error, attr, None)
+            if isinstance(value, int):
+                return value
+        response = getattr(error, "response", None)
+        if isinstance(getattr(response, "status_code", None), int):
+            return response.status_code
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def is_failover_error(error: BaseException) -> bool:
+    """レート制限（429）やサーバーエラー（5xx）ならセカンダリに切り替える"""
+    status = _status_code(error)
+    if status is not None:
+        return status in FAILOVER_STATUSES or 500 <= status < 600
+    return any(marker in str(error) for marker in FAILOVER_MARKERS)
+
+
+class _StartSignal(BaseCallbackHandler):
+    """
+    モデルの callbacks の最後に付け、run_id ごとに呼び出しが実際に始まった時刻を知らせる。
+    レート制限のコールバック（add_listener を持つもの）がある場合は、予算を取得した時点で
+    そこから知らせてもらう。非同期の呼び出しではコールバックが並行に実行されるため、
+    on_chat_model_start の順序では予算待ちの後かどうかが分からない。
+    """
+
+    def __init__(self):
+        self._waiting: Dict[UUID, threading.Event] = {}
+        self._started_at: Dict[UUID, float] = {}
+        self._lock = threading.Lock()
+        self.gated = False
+
+    def attach(self, llm: BaseChatModel):
+        gates = [h for h in llm.callbacks or [] if hasattr(h, "add_listener")]
+        for gate in gates:
+            gate.add_listener(self.mark_started)
+        self.gated = bool(gates)
+        llm.callbacks = [*(llm.callbacks or []), self]
+
+    def expect(self, run_id: UUID) -> threading.Event:
+        event = threading.Event()
+        with self._lock:
+            self._waiting[run_id] = event
+        return event
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if not self.gated:
+            self.mark_started(run_id)
+
+    def mark_started(self, run_id: UUID):
+        with self._lock:
+            event = self._waiting.pop(run_id, None)
+            if event is None:
+                return
+            self._started_at[run_id] = time.perf_counter()
+        event.set()
+
+    def started_at(self, run_id: UUID) -> Optional[float]:
+        with self._lock:
+            self._waiting.pop(run_id, None)
+            return self._started_at.pop(run_id, None)
+
+
+def _label(llm) -> str:
+    params = llm._get_ls_params()
+    return f"{params.get('ls_provider', '')}/{params.get('ls_model_name', '')}"
+
+
+class ResilientChatModel(BaseChatModel):
+    """
+    プライマリのモデルに送り、直近レイテンシの HEDGE_PERCENTILE を過ぎても
+    返ってこなければセカンダリにもヘッジリクエストを送って先に返った方を採用する。
+    プライマリが 429 / 5xx で失敗したときはセカンダリにフェイルオーバーする。
+    応答した側は llm_output の provider / model に入る。
+    """
+
+    primary: BaseChatModel
+    secondary: BaseChatModel
+    hedge_percentile: float = HEDGE_PERCENTILE
+    hedge_initial_delay: float = HEDGE_INITIAL_DELAY
+
+    _latencies: deque = PrivateAttr(
+        default_factory=lambda: deque(maxlen=LATENCY_WINDOW)
+    )
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _start_signal: _StartSignal = PrivateAttr(default_factory=_StartSignal)
+    _stats: dict = PrivateAttr(
+        default_factory=lambda: {
+            "calls": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "failovers": 0,
+        }
+    )
+
+    def model_post_init(self, __context):
+        super().model_post_init(__context)
+        self._start_signal.attach(self.primary)
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient"
+
+    @property
+    def _identifying_params(self):
+        # キャッシュキーは単独のプライマリと同じにする
+        return self.primary._identifying_params
+
+    def _get_ls_params(self, stop=None, **kwargs):
+        return self.primary._get_ls_params(stop=stop, **kwargs)
+
+    def _combine_llm_outputs(self, llm_outputs):
+        # 応答したプロバイダ（provider / model）を LLMResult に残す
+        return next((output for output in llm_outputs if output), {})
+
+    def hedge_delay(self) -> float:
+        """ヘッジリクエストを送るまでの待ち時間（直近レイテンシのパーセンタイル）"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < MIN_SAMPLES:
+            return self.hedge_initial_delay
+        index = min(int(len(samples) * self.hedge_percentile), len(samples) - 1)
+        return max(samples[index], HEDGE_MIN_DELAY)
+
+    def get_stats(self) -> dict:
+        """呼び出し数・ヘッジ数・ヘッジ側が勝った数・フェイルオーバー数を返す"""
+        with self._lock:
+            stats = dict(self._stats)
+        return {**stats, "hedge_delay": self.hedge_delay()}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _record_latency(self, elapsed: float):
+        with self._lock:
+            self._latencies.append(elapsed)
+
+    def _result(self, message, llm, hedged: bool, failover: bool) -> ChatResult:
+        provider, model = _label(llm).split("/", 1)
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={
+                "provider": provider,
+                "model": model,
+                "hedged": hedged,
+                "failover": failover,
+            },
+        )
+
+    def _call_primary(self, run_id: UUID, messages, stop, **kwargs):
+        start = time.perf_counter()
+        try:
+            message = self.primary.invoke(
+                messages, config={"run_id": run_id}, stop=stop, **kwargs
+            )
+        finally:
+            # レート制限の待ちを除いた、プロバイダの応答時間を記録する
+            start = self._start_signal.started_at(run_id) or start
+        self._record_latency(time.perf_counter() - start)
+        return message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self._count("calls")
+        # 呼び出しごとのスレッドで動かし、他の呼び出しのキュー待ちや
+        # 負けた側の呼び出しがヘッジまでの時間に影響しないようにする
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="llm-hedge"
+        )
+        try:
+            return self._generate_hedged(executor, messages, stop, **kwargs)
+        finally:
+            # 負けた側の呼び出しは待たずに戻る（結果は捨てる）
+            executor.shutdown(wait=False)
+
+    def _generate_hedged(self, executor, messages, stop, **kwargs) -> ChatResult:
+        run_id = uuid.uuid4()
+        started = self._start_signal.expect(run_id)
+        primary = executor.submit(self._call_primary, run_id, messages, stop, **kwargs)
+        # ヘッジまでの時間はプライマリの送信が始まってから数える
+        while not started.wait(START_POLL_INTERVAL) and not primary.done():
+            pass
+        try:
+            message = primary.result(timeout=self.hedge_delay())
+            return self._result(message, self.primary, False, False)
+        except concurrent.futures.TimeoutError:
+            pass
+        except Exception as e:
+            if not is_failover_error(e):
+                raise
+            print(f"プライマリ {_label(self.primary)} が失敗したため切り替えます: {e}")
+            self._count("failovers")
+            message = self.secondary.invoke(messages, stop=stop, **kwargs)
+            return self._result(message, self.secondary, False, True)
+
+        self._count("hedged")
+        secondary = executor.submit(
+            self.secondary.invoke, messages, stop=stop, **kwargs
+        )
+        futures = {primary: self.primary, secondary: self.secondary}
+        errors = []
+        for future in concurrent.futures.as_completed(futures):
+            llm = futures[future]
+            try:
+                message = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            if llm is self.secondary:
+                self._count("hedge_wins")
+            return self._result(message, llm, True, False)
+        raise errors[0]
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        self._count("calls")
+        run_id = uuid.uuid4()
+        started = self._start_signal.expect(run_id)
+
+        async def call_primary():
+            start = time.perf_counter()
+            try:
+                message = await self.primary.ainvoke(
+                    messages, config={"run_id": run_id}, stop=stop, **kwargs
+                )
+            finally:
+                # レート制限の待ちを除いた、プロバイダの応答時間を記録する
+                start = self._start_signal.started_at(run_id) or start
+            self._record_latency(time.perf_counter() - start)
+            return message
+
+        primary = asyncio.ensure_future(call_primary())
+        # ヘッジまでの時間はプライマリの送信が始まってから数える
+        while not started.is_set() and not primary.done():
+            await asyncio.wait({primary}, timeout=START_POLL_INTERVAL)
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+        if done:
+            try:
+                return self._result(primary.result(), self.primary, False, False)
+            except Exception as e:
+                if not is_failover_error(e):
+                    raise
+                print(
+                    f"プライマリ {_label(self.primary)} が失敗したため切り替えます: {e}"
+                )
+                self._count("failovers")
+                message = await self.secondary.ainvoke(messages, stop=stop, **kwargs)
+                return self._result(message, self.secondary, False, True)
+
+        self._count("hedged")
+        secondary = asyncio.ensure_future(
+            self.secondary.ainvoke(messages, stop=stop, **kwargs)
+        )
+        tasks = {primary: self.primary, secondary: self.secondary}
+        pending = set(tasks)
+        errors: List[BaseException] = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    if tasks[task] is self.secondary:
+                        self._count("hedge_wins")
+                    return self._result(task.result(), tasks[task], True, False)
+        finally:
+            # 負けた側の呼び出しは取り消す
+            for task in pending:
+                task.cancel()
+        raise errors[0]
+
+    def with_structured_output(self, schema: Any, **kwargs):
+        # 構造化出力はツール呼び出しに依存するため、ヘッジせずフェイルオーバーのみ行う
+        # _generate と同じく 429 / 5xx のときだけ切り替え、スキーマの検証エラーなどはそのまま返す
+        primary = self.primary.with_structured_output(schema, **kwargs)
+
+        def invoke_primary(input, config):
+            try:
+                return primary.invoke(input, config)
+            except Exception as e:
+                if is_failover_error(e):
+                    raise FailoverError(str(e)) from e
+                raise
+
+        async def ainvoke_primary(input, config):
+            try:
+                return await primary.ainvoke(input, config)
+            except Exception as e:
+                if is_failover_error(e):
+                    raise FailoverError(str(e)) from e
+                raise
+
+        return RunnableLambda(invoke_primary, afunc=ainvoke_primary).with_fallbacks(
+            [self.secondary.with_structured_output(schema, **kwargs)],
+            exceptions_to_handle=(FailoverError,),
+        )
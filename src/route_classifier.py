@@ -0,0 +1,297 @@
+import os
+import re
+import json
+import math
+import time
+import zlib
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# モデル・分類キャッシュ・統計の保存先（srcの一つ上の cache/route_classifier.json）
+MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "cache", "route_classifier.json"
+)
+CATEGORIES = ("general", "specialized")
+# 予測確率がこれ以上（または 1 - これ 以下）ならLLMを呼ばずに分類を確定する
+CONFIDENCE_THRESHOLD = 0.85
+# 文字 n-gram をハッシュして入れるバケット数
+FEATURE_BUCKETS = 1 << 18
+LEARNING_RATE = 0.2
+L2 = 1e-4
+# 分類キャッシュの最大件数（古いものから削除）
+MAX_CACHED = 2000
+# 学習前から効く専門的 / 一般的な質問のキーワード（キーワード1つあたりの重み）
+KEYWORD_WEIGHT = 1.2
+SPECIALIZED_KEYWORDS = (
+    "アルゴリズム",
+    "実装",
+    "計算量",
+    "証明",
+    "数式",
+    "微分",
+    "積分",
+    "行列",
+    "プロトコル",
+    "アーキテクチャ",
+    "カーネル",
+    "コンパイラ",
+    "並行",
+    "非同期",
+    "データベース",
+    "インデックス",
+    "トランザクション",
+    "暗号",
+    "量子",
+    "統計",
+    "ニューラル",
+    "機械学習",
+    "最適化",
+    "api",
+    "sql",
+    "tcp",
+    "http",
+    "gpu",
+    "python",
+    "rust",
+    "kubernetes",
+    "docker",
+    "メモリ",
+    "スレッド",
+    "レイテンシ",
+    "脆弱性",
+    "プログラム",
+    "コード",
+    "設計",
+    "仕様",
+    "論文",
+    "理論",
+    "診断",
+    "法的",
+)
+GENERAL_KEYWORDS = (
+    "おすすめ",
+    "オススメ",
+    "簡単に",
+    "とは何",
+    "って何",
+    "どんな",
+    "好き",
+    "天気",
+    "料理",
+    "レシピ",
+    "旅行",
+    "趣味",
+    "映画",
+    "音楽",
+    "今日",
+    "週末",
+    "初心者",
+    "楽しい",
+    "面白い",
+    "雑談",
+    "挨拶",
+    "こんにちは",
+)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(
+        r"\s+", " ", unicodedata.normalize("NFKC", text or "").lower()
+    ).strip()
+
+
+def _features(text: str) -> Dict[str, float]:
+    """文字 2-gram / 3-gram のハッシュ特徴量（出現数を正規化）"""
+    compact = text.replace(" ", "")
+    grams = [compact[i : i + n] for n in (2, 3) for i in range(len(compact) - n + 1)]
+    if not grams:
+        return {}
+    scale = 1.0 / math.sqrt(len(grams))
+    features: Dict[str, float] = {}
+    for gram in grams:
+        key = str(zlib.crc32(gram.encode("utf-8")) % FEATURE_BUCKETS)
+        features[key] = features.get(key, 0.0) + scale
+    return features
+
+
+URL_RE = re.compile(r"https?://\S+")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _has_keyword(keyword: str, text: str, words: set) -> bool:
+    # 英単語は単語単位で比べる（"api" が "rapid" に一致しないように）
+    # 日本語は単語に区切らないので部分一致で見る
+    return keyword in words if keyword.isascii() else keyword in text
+
+
+def _keyword_score(text: str) -> float:
+    """専門的なキーワードは正、一般的なキーワードは負に数える（URL の中は数えない）"""
+    text = URL_RE.sub(" ", text)
+    words = set(WORD_RE.findall(text))
+    specialized = sum(1 for k in SPECIALIZED_KEYWORDS if _has_keyword(k, text, words))
+    general = sum(1 for k in GENERAL_KEYWORDS if _has_keyword(k, text, words))
+    return (specialized - general) * KEYWORD_WEIGHT
+
+
+class RouteClassifier:
+    """
+    routing_workflow の質問分類（general / specialized）をローカルで行う分類器。
+    キーワードのスコアとハッシュ化した文字 n-gram のロジスティック回帰を足し合わせ、
+    確信度が CONFIDENCE_THRESHOLD 以上のときだけ結果を返す（それ以外はLLMに任せる）。
+    LLMで分類した質問は learn() で学習に使い、モデル・過去の分類・統計を JSON に保存する。
+    """
+
+    def __init__(
+        self, path: Optional[str] = MODEL_PATH, threshold: float = CONFIDENCE_THRESHOLD
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.weights: Dict[str, float] = {}
+        self.bias = 0.0
+        self.examples = 0
+        self.cache: "OrderedDict[str, str]" = OrderedDict()
+        self.stats = {
+            "cache": 0,
+            "local": 0,
+            "llm": 0,
+            # LLMに回した質問で、ローカルの予測がLLMと一致した数
+            "llm_agreed": 0,
+            "local_seconds": 0.0,
+            "llm_seconds": 0.0,
+        }
+        self._lock = threading.Lock()
+        # 保存は1つずつ行い、後から書いた方が必ず新しい内容になるようにする
+        self._save_lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.weights = data.get("weights", {})
+            self.bias = data.get("bias", 0.0)
+            self.examples = data.get("examples", 0)
+            self.cache = OrderedDict(data.get("cache", {}))
+            self.stats.update(data.get("stats", {}))
+
+    @staticmethod
+    def _key(question: str) -> str:
+        return hashlib.sha256(_normalize(question).encode("utf-8")).hexdigest()
+
+    def probability(self, question: str) -> float:
+        """specialized である確率"""
+        text = _normalize(question)
+        z = self.bias + _keyword_score(text)
+        with self._lock:
+            z += sum(self.weights.get(k, 0.0) * v for k, v in _features(text).items())
+        return 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0)))
+
+    def predict(self, question: str) -> Tuple[str, float]:
+        """(カテゴリ, 確信度) を返す"""
+        p = self.probability(question)
+        return ("specialized", p) if p >= 0.5 else ("general", 1.0 - p)
+
+    def classify(self, question: str, use_cache: bool = True) -> Optional[str]:
+        """
+        過去の分類か、確信度の高いローカル予測があればカテゴリを返す。
+        判断できなければ None（呼び出し側でLLMに分類させて learn() を呼ぶ）。
+        """
+        start = time.perf_counter()
+        key = self._key(question)
+        if use_cache:
+            with self._lock:
+                category = self.cache.get(key)
+                if category is not None:
+                    self.cache.move_to_end(key)
+                    self.stats["cache"] += 1
+                    return category
+        category, confidence = self.predict(question)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats["local_seconds"] += elapsed
+            if confidence < self.threshold:
+                return None
+            self.stats["local"] += 1
+            self._remember(key, category)
+        return category
+
+    def learn(self, question: str, category: str, llm_seconds: float = 0.0):
+        """LLMによる分類結果を記録し、1ステップ学習して保存する"""
+        if category not in CATEGORIES:
+            return
+        p = self.probability(question)
+        predicted = "specialized" if p >= 0.5 else "general"
+        target = 1.0 if category == "specialized" else 0.0
+        gradient = p - target
+        features = _features(_normalize(question))
+        with self._lock:
+            for k, v in features.items():
+                w = self.weights.get(k, 0.0)
+                self.weights[k] = w - LEARNING_RATE * (gradient * v + L2 * w)
+            self.bias -= LEARNING_RATE * gradient * 0.1
+            self.examples += 1
+            self.stats["llm"] += 1
+            self.stats["llm_seconds"] += llm_seconds
+            if predicted == category:
+                self.stats["llm_agreed"] += 1
+            self._remember(self._key(question), category)
+        self.save()
+
+    def _remember(self, key: str, category: str):
+        self.cache[key] = category
+        self.cache.move_to_end(key)
+        while len(self.cache) > MAX_CACHED:
+            self.cache.popitem(last=False)
+
+    def evaluate(self, labeled: List[Tuple[str, str]]) -> Dict[str, float]:
+        """(質問, 正解カテゴリ) の組で、ローカル予測の正解率と確信して答えた割合を測る"""
+        correct = confident = confident_correct = 0
+        for question, category in labeled:
+            predicted, confidence = self.predict(question)
+            correct += predicted == category
+            if confidence >= self.threshold:
+                confident += 1
+                confident_correct += predicted == category
+        total = len(labeled) or 1
+        return {
+            "accuracy": correct / total,
+            "coverage": confident / total,
+            "confident_accuracy": confident_correct / (confident or 1),
+        }
+
+    def report(self) -> Dict[str, float]:
+        """分類の内訳・LLMとの一致率・1回あたりの平均レイテンシを返す"""
+        with self._lock:
+            stats = dict(self.stats)
+            examples = self.examples
+        total = stats["cache"] + stats["local"] + stats["llm"]
+        # ローカル予測はキャッシュに無かった質問（local + llm）で行っている
+        predicted = stats["local"] + stats["llm"]
+        return {
+            "examples": examples,
+            "cache_hits": stats["cache"],
+            "local": stats["local"],
+            "llm": stats["llm"],
+            "llm_avoided_rate": (stats["cache"] + stats["local"]) / (total or 1),
+            "agreement_with_llm": stats["llm_agreed"] / (stats["llm"] or 1),
+            "local_ms": stats["local_seconds"] * 1000 / (predicted or 1),
+            "llm_ms": stats["llm_seconds"] * 1000 / (stats["llm"] or 1),
+        }
+
+    def save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                data = {
+                    "weights": {k: round(w, 6) for k, w in self.weights.items() if w},
+                    "bias": self.bias,
+                    "examples": self.examples,
+                    "cache": dict(self.cache),
+                    "stats": dict(self.stats),
+                }
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
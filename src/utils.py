@@ -2,17 +2,82 @@ from typing import Optional, Union, List, Dict, Any
 from pathlib import Path
 import base64
 from enum import Enum
-from langchain_openai import ChatOpenAI
+from collections import OrderedDict
 from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import LLMChain, SequentialChain
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.outputs import ChatGeneration
 import concurrent.futures
+import threading
+import re
+import time
+import asyncio
+import weakref
+import os
+import json
 from dotenv import load_dotenv
+from llm_cache import LlmCache, make_key
+from resilient_llm import ResilientChatModel
+from llm_scheduler import RateScheduler
+from route_classifier import RouteClassifier
+from article_preprocess import estimate_tokens
+import llm_metrics
 
 load_dotenv()  # .env ファイルから環境変数を読み込み
 
-# 他のプロバイダ向けも同様にインポート可能
+# LLMクライアントプール（provider / model / kwargs ごとに1インスタンス）
+LLM_POOL_ENABLED = True
+_llm_pool: Dict[Any, Any] = {}
+_llm_pool_lock = threading.Lock()
+_llm_pool_stats = {"hits": 0, "misses": 0}
+
+# LLM応答の永続キャッシュ（オプトイン。環境変数 LLM_CACHE=1 か enable_llm_cache() で有効化）
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "").lower() in ("1", "true")
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+# ヘッジリクエスト／フェイルオーバー（オプトイン。環境変数 LLM_HEDGE=1 か enable_hedging() で有効化）
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "").lower() in ("1", "true")
+# プライマリのプロバイダごとのセカンダリ (provider, model)
+HEDGE_SECONDARY = {
+    "gemini": ("openai", "gpt-4o-mini"),
+    "openai": ("gemini", "gemini-2.0-flash"),
+}
+
+# provider / model ごとの RPM・TPM スケジューラ（上限に達した呼び出しは失敗させずに待たせる）
+RATE_LIMIT_ENABLED = True
+_rate_scheduler = RateScheduler()
+
+# simple / simple_batch / asimple で LLMChain + SequentialChain の代わりに
+# 組み立て済みの FastChain を使い回す
+SIMPLE_FAST_PATH = True
+_fast_chains: Dict[Any, "FastChain"] = {}
+_fast_chains_lock = threading.Lock()
+
+# routing_workflow で確信度の高い質問はLLMを呼ばずにローカルで分類する
+LOCAL_ROUTING_ENABLED = True
+_route_classifier = None
+_route_classifier_lock = threading.Lock()
+
+# simple_batch での同時実行数
+BATCH_MAX_CONCURRENCY = 4
+
+# analyze_image でローカル画像を送る前に縮小する上限（長辺px / バイト数。None で無効）
+IMAGE_MAX_SIDE = 2048
+IMAGE_MAX_BYTES = 4 * 1024 * 1024
+IMAGE_JPEG_QUALITIES = (90, 80, 70, 60, 50)
+# base64 変換のチャンクサイズ（3の倍数にすると連結しても正しい base64 になる）
+IMAGE_ENCODE_CHUNK_SIZE = 3 * 256 * 1024
+# エンコード済み画像のキャッシュ（パス・更新時刻・サイズ・縮小設定ごと）の base64 文字数の上限
+# 超えたら最後に使ったのが古いものから削除する（上限を超える画像1枚はキャッシュしない）
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_image_cache: "OrderedDict[Any, str]" = OrderedDict()
+_image_cache_bytes = 0
+_image_cache_lock = threading.Lock()
+
+# プロバイダのSDK（langchain_openai など）と langchain.chains は import に数秒かかるため、
+# 起動を速くするよう初めて使うときに読み込む
+# 他のプロバイダ向けも同様に _create_llm 内でインポート可能
 # from langchain_deepseek import ChatDeepSeek
 # from langchain_anthropic import ChatAnthropic
 
@@ -132,7 +197,11 @@ def sample(
 
 
 def get_llm(
-    provider: str = None, model: str = None, reasoning_effort: str = None, **kwargs
+    provider: str = None,
+    model: str = None,
+    reasoning_effort: str = None,
+    hedge: bool = None,
+    **kwargs,
 ):
     # provider が未指定の場合は "gemini" をデフォルトとする
     if not provider:
@@ -145,16 +214,137 @@ def get_llm(
         elif provider == "gemini":
             model = "gemini-2.0-flash"
 
+    if hedge is None:
+        hedge = HEDGE_ENABLED
+
     print(f"provider: {provider}, model: {model}")
+    if not LLM_POOL_ENABLED:
+        return _create_resilient_llm(provider, model, reasoning_effort, hedge, **kwargs)
+
+    # 同じ設定のクライアント（と keep-alive 接続）はプロセス内で使い回す
+    # ヘッジ時のレイテンシ統計もこのインスタンスに蓄積される
+    key = (provider, model, reasoning_effort, hedge, _freeze(kwargs))
+    with _llm_pool_lock:
+        llm = _llm_pool.get(key)
+        if llm is not None:
+            _llm_pool_stats["hits"] += 1
+            return llm
+        _llm_pool_stats["misses"] += 1
+        llm = _create_resilient_llm(provider, model, reasoning_effort, hedge, **kwargs)
+        _llm_pool[key] = llm
+        return llm
+
+
+def _create_resilient_llm(
+    provider: str, model: str, reasoning_effort: str, hedge: bool, **kwargs
+):
+    """hedge=True なら HEDGE_SECONDARY のモデルと組み合わせた ResilientChatModel を返す"""
+    primary = _with_rate_limit(
+        _create_llm(provider, model, reasoning_effort, **kwargs), provider, model
+    )
+    if not hedge or provider not in HEDGE_SECONDARY:
+        return primary
+    secondary_provider, secondary_model = HEDGE_SECONDARY[provider]
+    try:
+        secondary = _with_rate_limit(
+            _create_llm(secondary_provider, secondary_model, **kwargs),
+            secondary_provider,
+            secondary_model,
+        )
+    except Exception as e:
+        # APIキーが無いなどでセカンダリを作れない場合はプライマリのみで動かす
+        print(f"セカンダリ {secondary_provider} を作成できないためヘッジしません: {e}")
+        return primary
+    return ResilientChatModel(primary=primary, secondary=secondary)
+
+
+def _create_llm(provider: str, model: str, reasoning_effort: str = None, **kwargs):
     if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
         return ChatOpenAI(model=model, reasoning_effort=reasoning_effort, **kwargs)
     elif provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
         return ChatGoogleGenerativeAI(model=model, **kwargs)
     else:
         raise ValueError(f"Unknown provider: {provider}")
 
 
+def _with_rate_limit(llm, provider: str, model: str):
+    """
+    モデルにスケジューラのコールバックを付ける。invoke / batch / 非同期 / 構造化出力の
+    どの経路でも、呼び出し前に provider / model の RPM・TPM 予算が空くまで待つ。
+    """
+    if RATE_LIMIT_ENABLED:
+        llm.callbacks = [
+            *(llm.callbacks or []),
+            _rate_scheduler.handler(provider, model),
+        ]
+    return llm
+
+
+def set_rate_limit(
+    provider: str, model: str = None, rpm: float = None, tpm: float = None
+):
+    """provider（model 指定時はそのモデルだけ）の RPM・TPM 上限を変更する"""
+    _rate_scheduler.set_limit(provider, model, rpm=rpm, tpm=tpm)
+
+
+def get_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """provider / model ごとの上限・呼び出し数・待ち時間の合計を返す"""
+    return _rate_scheduler.stats()
+
+
+def _freeze(value):
+    """kwargs をクライアントプールのキーに使えるようにハッシュ可能な形へ変換する"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(repr(v) for v in value))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        # ハッシュできないオブジェクトは同一インスタンスのときだけ共有する
+        return ("id", id(value))
+
+
+def enable_hedging(enabled: bool = True):
+    """ヘッジリクエスト／フェイルオーバーを有効（無効）にする"""
+    global HEDGE_ENABLED
+    HEDGE_ENABLED = enabled
+
+
+def get_hedge_stats() -> Dict[str, Dict[str, Any]]:
+    """プール内の ResilientChatModel ごとのヘッジ・フェイルオーバー回数を返す"""
+    with _llm_pool_lock:
+        items = list(_llm_pool.items())
+    return {
+        f"{key[0]}/{key[1]}": llm.get_stats()
+        for key, llm in items
+        if isinstance(llm, ResilientChatModel)
+    }
+
+
+def get_llm_pool_stats() -> Dict[str, int]:
+    """クライアントプールのヒット数・ミス数・保持数を返す"""
+    with _llm_pool_lock:
+        return {**_llm_pool_stats, "size": len(_llm_pool)}
+
+
+def clear_llm_pool():
+    with _llm_pool_lock:
+        _llm_pool.clear()
+        _llm_pool_stats["hits"] = 0
+        _llm_pool_stats["misses"] = 0
+
+
 def create_chain(llm, prompt_str: str, output_key: str):
+    from langchain.chains import LLMChain
+
     prompt_template = ChatPromptTemplate.from_messages([("human", prompt_str)])
     return LLMChain(llm=llm, prompt=prompt_template, output_key=output_key)
 
@@ -170,18 +360,206 @@ def get_chain(
     return create_chain(llm_instance, prompt_str, output_key)
 
 
-def question(topic: str, provider: str = None, model: str = None):
-    results = simple(topic, provider, model)
+class FastChain:
+    """
+    プロンプト整形 → LLM → StrOutputParser を LLMChain と同じ入出力
+    （入力の dict に output_key の結果を加えた dict）で扱う薄いラッパー。
+    呼び出しごとにチェーンを組み立て直さずに済むよう get_fast_chain で使い回す。
+    invoke / ainvoke / batch はプロンプト整形と出力の取り出しを直接行い、
+    コールバック（計測・レート制限）は LLM の呼び出しにだけ付ける。
+    """
+
+    def __init__(self, llm, prompt_str: str, output_key: str):
+        self.llm = llm
+        self.prompt = ChatPromptTemplate.from_messages([("human", prompt_str)])
+        self.parser = StrOutputParser()
+        self.output_key = output_key
+        self.output_keys = [output_key]
+
+    def _parse(self, message) -> str:
+        return self.parser.parse_result([ChatGeneration(message=message)])
+
+    def invoke(self, inputs: Dict[str, Any], config=None) -> Dict[str, Any]:
+        message = self.llm.invoke(self.prompt.format_messages(**inputs), config=config)
+        return {**inputs, self.output_key: self._parse(message)}
+
+    async def ainvoke(self, inputs: Dict[str, Any], config=None) -> Dict[str, Any]:
+        message = await self.llm.ainvoke(
+            self.prompt.format_messages(**inputs), config=config
+        )
+        return {**inputs, self.output_key: self._parse(message)}
+
+    def batch(self, inputs: List[Dict[str, Any]], config=None) -> List[Dict[str, Any]]:
+        messages = self.llm.batch(
+            [self.prompt.format_messages(**i) for i in inputs], config=config
+        )
+        return [
+            {**i, self.output_key: self._parse(message)}
+            for i, message in zip(inputs, messages)
+        ]
+
+
+def get_fast_chain(
+    prompt_str: str, output_key: str, provider: str = None, model: str = None, **kwargs
+) -> FastChain:
+    """get_chain の FastChain 版。同じ設定のチェーンはプロセス内で使い回す"""
+    llm_instance = get_llm(provider, model=model, **kwargs)
+    if not LLM_POOL_ENABLED:
+        return FastChain(llm_instance, prompt_str, output_key)
+    key = (id(llm_instance), prompt_str, output_key)
+    with _fast_chains_lock:
+        chain = _fast_chains.get(key)
+        if chain is None or chain.llm is not llm_instance:
+            chain = FastChain(llm_instance, prompt_str, output_key)
+            _fast_chains[key] = chain
+        return chain
+
+
+def enable_llm_cache(enabled: bool = True, path: Optional[str] = None):
+    """LLM応答キャッシュを有効（無効）にする。path で保存先を変更できる"""
+    global LLM_CACHE_ENABLED, _llm_cache
+    LLM_CACHE_ENABLED = enabled
+    if path:
+        with _llm_cache_lock:
+            _llm_cache = LlmCache(path)
+
+
+def get_llm_cache() -> LlmCache:
+    global _llm_cache
+    if _llm_cache is None:
+        # バッチと非同期の呼び出しが同時に初回アクセスしても接続を1つだけ開く
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LlmCache()
+    return _llm_cache
+
+
+def _chain_signature(chain) -> Dict[str, Any]:
+    """チェーンのモデル設定とプロンプトテンプレートをキャッシュキー用にまとめる"""
+    sub_chains = getattr(chain, "chains", None)
+    if sub_chains:
+        return {"chains": [_chain_signature(c) for c in sub_chains]}
+    # ヘッジ付きのモデルはプライマリ単独と同じキーにする
+    llm = getattr(chain.llm, "primary", chain.llm)
+    signature = {
+        "provider": type(llm).__name__,
+        "params": llm._identifying_params,
+        "prompt": [m.prompt.template for m in chain.prompt.messages],
+    }
+    if isinstance(chain, FastChain):
+        # 1段の SequentialChain と同じキーにして、既存のキャッシュをそのまま使う
+        return {"chains": [signature]}
+    return signature
+
+
+def _cache_key(chain, inputs: Dict[str, Any]):
+    """キャッシュキーと、記録用の provider / model を返す"""
+    signature = _chain_signature(chain)
+    first = signature["chains"][0] if "chains" in signature else signature
+    model = first["params"].get("model") or first["params"].get("model_name", "")
+    key = make_key(
+        first["provider"],
+        model,
+        signature,
+        json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=str),
+    )
+    return key, first["provider"], model
+
+
+def _store_cache(key: str, chain, result: Dict[str, Any], provider: str, model: str):
+    outputs = {k: v for k, v in result.items() if k in chain.output_keys}
+    get_llm_cache().set(key, json.dumps(outputs, ensure_ascii=False), provider, model)
+
+
+def llm_config(workflow: str = None) -> Dict[str, Any]:
+    """計測用のコールバックと呼び出し元ワークフロー名を渡す RunnableConfig"""
+    return {
+        "callbacks": [llm_metrics.get_handler()],
+        "metadata": {"workflow": workflow or ""},
+    }
+
+
+def invoke_chain(
+    chain, inputs: Dict[str, Any], use_cache: bool = True, workflow: str = None
+) -> Dict[str, Any]:
+    """
+    チェーンを実行する。キャッシュ有効時はモデル設定・プロンプト・入力が同じなら
+    保存済みの応答を返す。use_cache=False で常に新しい応答を取得する。
+    呼び出しは llm_metrics に workflow 名付きで記録される。
+    """
+    if not (use_cache and LLM_CACHE_ENABLED):
+        return chain.invoke(inputs, config=llm_config(workflow))
+
+    key, provider, model = _cache_key(chain, inputs)
+    cached = get_llm_cache().get(key)
+    if cached is not None:
+        return {**inputs, **json.loads(cached)}
+
+    result = chain.invoke(inputs, config=llm_config(workflow))
+    _store_cache(key, chain, result, provider, model)
+    return result
+
+
+def question(
+    topic: str, provider: str = None, model: str = None, use_cache: bool = True
+):
+    results = simple(topic, provider, model, use_cache=use_cache)
     return results[0]
 
 
 ########################################
 # 0. シンプル
 ########################################
+def _simple_chain(provider: str = None, model: str = None):
+    """simple 用のチェーン。SIMPLE_FAST_PATH なら組み立て済みの FastChain を使い回す"""
+    if not SIMPLE_FAST_PATH:
+        return _build_simple_chain(provider, model)
+    return get_fast_chain(
+        provider=provider if provider is not None else "gemini",
+        model=model if model is not None else "gemini-2.0-flash",
+        prompt_str="{topic}",
+        output_key="explanation",
+    )
+
+
+def _build_simple_chain(provider: str = None, model: str = None):
+    from langchain.chains import SequentialChain
+
+    chains = []  # チェーンを格納するリスト
+    chains.append(
+        get_chain(
+            provider=provider if provider is not None else "gemini",
+            model=model if model is not None else "gemini-2.0-flash",
+            prompt_str="{topic}",
+            output_key="explanation",
+        )
+    )
+
+    # 2つ目以降のチェーンを追加したい場合はここでappend
+    # chains.append(
+    #     get_chain(
+    #         provider=provider if provider is not None else "gemini",
+    #         model=model if model is not None else "gemini-2.0-flash",
+    #         prompt_str="上記の説明を踏まえて、関連する具体例を一つ挙げてください。説明: {explanation}",
+    #         output_key="example",
+    #     )
+    # )
+
+    # SequentialChainを作成
+    overall_chain = SequentialChain(
+        chains=chains,
+        input_variables=["topic"],
+        output_variables=["explanation"],
+        # output_variables=["explanation", "example"],
+    )
+    return overall_chain
+
+
 def simple(
     topic: Union[str, List[str]],
     provider: str = None,
     model: str = None,
+    use_cache: bool = True,
 ):
     # topicがstrならリスト化
     if isinstance(topic, str):
@@ -191,45 +569,72 @@ def simple(
 
     results = []
     for t in topics:
-        chains = []  # チェーンを格納するリスト
-        chains.append(
-            get_chain(
-                provider=provider if provider is not None else "gemini",
-                model=model if model is not None else "gemini-2.0-flash",
-                prompt_str="{topic}",
-                output_key="explanation",
-            )
+        overall_chain = _simple_chain(provider, model)
+        result = invoke_chain(
+            overall_chain, {"topic": t}, use_cache=use_cache, workflow="simple"
         )
-
-        # 2つ目以降のチェーンを追加したい場合はここでappend
-        # chains.append(
-        #     get_chain(
-        #         provider=provider if provider is not None else "gemini",
-        #         model=model if model is not None else "gemini-2.0-flash",
-        #         prompt_str="上記の説明を踏まえて、関連する具体例を一つ挙げてください。説明: {explanation}",
-        #         output_key="example",
-        #     )
-        # )
-
-        # SequentialChainを作成
-        overall_chain = SequentialChain(
-            chains=chains,
-            input_variables=["topic"],
-            output_variables=["explanation"],
-            # output_variables=["explanation", "example"],
-        )
-
-        result = overall_chain.invoke({"topic": t})
         print(f"{t}: {result['explanation']}")
         results.append(result["explanation"])
         # print(result["example"])
     return results
 
 
+def simple_batch(
+    topics: List[str],
+    provider: str = None,
+    model: str = None,
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    use_cache: bool = True,
+) -> List[str]:
+    """
+    simple の一括版。1つのチェーンで .batch() を使い、max_concurrency 件ずつ並列に実行する。
+    キャッシュ済みのトピックは呼び出さない。結果は topics と同じ順序で返す。
+    """
+    overall_chain = _simple_chain(provider, model)
+    results: List[Optional[str]] = [None] * len(topics)
+    pending = []
+    for i, t in enumerate(topics):
+        if use_cache and LLM_CACHE_ENABLED:
+            key, _, _ = _cache_key(overall_chain, {"topic": t})
+            cached = get_llm_cache().get(key)
+            if cached is not None:
+                results[i] = json.loads(cached)["explanation"]
+                continue
+        pending.append(i)
+
+    if pending:
+        outputs = overall_chain.batch(
+            [{"topic": topics[i]} for i in pending],
+            config={**llm_config("simple_batch"), "max_concurrency": max_concurrency},
+        )
+        for i, output in zip(pending, outputs):
+            results[i] = output["explanation"]
+            if use_cache and LLM_CACHE_ENABLED:
+                key, cache_provider, cache_model = _cache_key(
+                    overall_chain, {"topic": topics[i]}
+                )
+                _store_cache(key, overall_chain, output, cache_provider, cache_model)
+
+    for t, result in zip(topics, results):
+        print(f"{t}: {result}")
+    return results
+
+
 ########################################
 # 1. プロンプトチェーン (Prompt Chain)
 ########################################
-def prompt_chain_workflow(topic: str, provider: str = None, model: str = None):
+def prompt_chain_workflow(
+    topic: str,
+    provider: str = None,
+    model: str = None,
+    use_cache: bool = True,
+    parallel_sections: bool = False,
+    max_workers: int = 4,
+):
+    """
+    parallel_sections=True の場合、Step2 のセクション執筆を max_workers 件まで並列に行う。
+    戻り値の sectionTimings に各セクションの執筆にかかった秒数を含める。
+    """
     # Step1: 全体の構成やアウトラインを生成
     chainOutline = get_chain(
         prompt_str="トピック「{topic}」について、全体の構成やアウトラインを生成してください。",
@@ -238,7 +643,9 @@ def prompt_chain_workflow(topic: str, provider: str = None, model: str = None):
         model=model,
     )
     # アウトライン生成の呼び出し
-    outlineResult = chainOutline.invoke({"topic": topic})
+    outlineResult = invoke_chain(
+        chainOutline, {"topic": topic}, use_cache=use_cache, workflow="prompt_chain"
+    )
     outlineText = outlineResult.get("outline", "").strip()
     if not outlineText:
         raise ValueError(
@@ -258,23 +665,52 @@ def prompt_chain_workflow(topic: str, provider: str = None, model: str = None):
         )
 
     # Step2: 各セクションごとに詳細な文章を個別のLLM呼び出しで生成
-    detailSections = []
-    for section in sections:
-        # 個別セクションの文章生成チェーンを作成
-        chainSection = get_chain(
-            prompt_str="以下のセクションの内容を詳細に執筆してください:\n{section}",
-            output_key="detail",
-            provider=provider,
-            model=model,
+    # 個別セクションの文章生成チェーンを作成（全セクションで共有）
+    chainSection = get_chain(
+        prompt_str="以下のセクションの内容を詳細に執筆してください:\n{section}",
+        output_key="detail",
+        provider=provider,
+        model=model,
+    )
+
+    def draft_section(section: str):
+        # セクションの詳細文章生成を実行し、かかった秒数も返す
+        start = time.perf_counter()
+        detailResult = invoke_chain(
+            chainSection,
+            {"section": section},
+            use_cache=use_cache,
+            workflow="prompt_chain",
         )
-        # セクションの詳細文章生成を実行
-        detailResult = chainSection.invoke({"section": section})
+        elapsed = time.perf_counter() - start
         detailText = detailResult.get("detail", "").strip()
         if not detailText:
             raise ValueError(
                 f"エラー: セクション '{section}' の文章生成に失敗しました。返却された文章が空です。"
             )
-        detailSections.append(detailText)
+        print(f"セクション執筆 {elapsed:.2f}秒: {section[:30]}")
+        return detailText, elapsed
+
+    if parallel_sections:
+        # 並列に執筆し、結果はアウトラインの順序で並べる。空のセクションがあれば残りを取り消す
+        drafted: List[Any] = [None] * len(sections)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            future_to_index = {
+                executor.submit(draft_section, section): i
+                for i, section in enumerate(sections)
+            }
+            for future in concurrent.futures.as_completed(future_to_index):
+                drafted[future_to_index[future]] = future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        drafted = [draft_section(section) for section in sections]
+    detailSections = [detailText for detailText, _ in drafted]
+    sectionTimings = [
+        {"section": section, "seconds": elapsed}
+        for section, (_, elapsed) in zip(sections, drafted)
+    ]
 
     # Step3: 各セクションの詳細文章を統合し、全体として整合性のある文章に補正・チェックする
     combinedDetails = "\n".join(detailSections)
@@ -284,34 +720,46 @@ def prompt_chain_workflow(topic: str, provider: str = None, model: str = None):
         provider=provider,
         model=model,
     )
-    finalResult = integrationChain.invoke({"details": combinedDetails})
+    finalResult = invoke_chain(
+        integrationChain,
+        {"details": combinedDetails},
+        use_cache=use_cache,
+        workflow="prompt_chain",
+    )
     finalOutput = finalResult.get("finalOutput", "").strip()
     if not finalOutput:
         raise ValueError(
             "エラー: 統合および補正処理により最終文章の生成に失敗しました。"
         )
 
-    return {"outline": outlineText, "finalOutput": finalOutput}
+    return {
+        "outline": outlineText,
+        "finalOutput": finalOutput,
+        "sectionTimings": sectionTimings,
+    }
 
 
 ########################################
 # 2. ルーティング (Routing)
 ########################################
 def routing_workflow(
-    question: str, provider: Optional[str] = None, model: Optional[str] = None
+    question: str,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    use_cache: bool = True,
 ):
-    # Step1: 質問を分類するチェーンを作成
-    classify_chain = get_chain(
-        prompt_str=(
-            "次の質問を、一般的な質問か専門的な質問かに分類してください。"
-            "\n質問: {question}\n出力は 'general' か 'specialized' のどちらかのみで。"
-        ),
-        output_key="category",
-        provider=provider,
-        model=model,
-    )
-    classification = classify_chain.invoke({"question": question})
-    category = classification["category"].strip().lower()
+    # Step1: 質問を分類（ローカルで確信できなければLLMで分類）
+    category = _local_route(question, use_cache)
+    if category is None:
+        start = time.perf_counter()
+        classification = invoke_chain(
+            _route_classify_chain(provider, model),
+            {"question": question},
+            use_cache=use_cache,
+            workflow="routing",
+        )
+        category = classification["category"].strip().lower()
+        _learn_route(question, category, time.perf_counter() - start)
 
     # Step2: 分類結果に基づき、回答チェーンを切り替え
     if category == "general":
@@ -333,11 +781,50 @@ def routing_workflow(
     else:
         return {"error": "質問の分類に失敗しました。"}
 
-    answer_result = answer_chain.invoke({"question": question})
+    answer_result = invoke_chain(
+        answer_chain, {"question": question}, use_cache=use_cache, workflow="routing"
+    )
     answer_result["category"] = category
     return answer_result
 
 
+def _route_classify_chain(provider: Optional[str], model: Optional[str]):
+    return get_chain(
+        prompt_str=(
+            "次の質問を、一般的な質問か専門的な質問かに分類してください。"
+            "\n質問: {question}\n出力は 'general' か 'specialized' のどちらかのみで。"
+        ),
+        output_key="category",
+        provider=provider,
+        model=model,
+    )
+
+
+def get_route_classifier() -> RouteClassifier:
+    global _route_classifier
+    if _route_classifier is None:
+        with _route_classifier_lock:
+            if _route_classifier is None:
+                _route_classifier = RouteClassifier()
+    return _route_classifier
+
+
+def _local_route(question: str, use_cache: bool) -> Optional[str]:
+    if not LOCAL_ROUTING_ENABLED:
+        return None
+    return get_route_classifier().classify(question, use_cache=use_cache)
+
+
+def _learn_route(question: str, category: str, llm_seconds: float):
+    if LOCAL_ROUTING_ENABLED:
+        get_route_classifier().learn(question, category, llm_seconds)
+
+
+def get_routing_stats() -> Dict[str, float]:
+    """ローカル分類で省いたLLM呼び出しの割合・LLMとの一致率・平均レイテンシを返す"""
+    return get_route_classifier().report()
+
+
 ########################################
 # 3. 並列化 (Parallelization)
 ########################################
@@ -346,6 +833,7 @@ def parallel_workflow(
     subtasks: list,
     provider: Optional[str] = None,
     model: Optional[str] = None,
+    use_cache: bool = True,
 ):
     # サブタスク毎に独立したチェーンを作成し、並列に処理する関数
     def process_subtask(subtask: str):
@@ -356,7 +844,12 @@ def parallel_workflow(
             provider=provider,
             model=model,
         )
-        return chain.invoke({"subtask": subtask, "task": task})["result"]
+        return invoke_chain(
+            chain,
+            {"subtask": subtask, "task": task},
+            use_cache=use_cache,
+            workflow="parallel",
+        )["result"]
 
     results = {}
     with concurrent.futures.ThreadPoolExecutor() as executor:
@@ -376,7 +869,13 @@ def parallel_workflow(
 # 4. オーケストレーション (Orchestration)
 ########################################
 def orchestration_workflow(
-    task: str, provider: Optional[str] = None, model: Optional[str] = None
+    task: str,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    use_cache: bool = True,
+    max_workers: int = 4,
+    map_reduce: bool = False,
+    reduce_token_budget: int = 6000,
 ):
     """
     オーケストレーション ワークフロー関数
@@ -386,6 +885,11 @@ def orchestration_workflow(
     @param task: タスクの内容 (str)
     @param provider: 使用するLLMプロバイダの識別子。未指定の場合はデフォルト値を使用 (Optional[str])
     @param model: 利用するLLMモデル名。未指定の場合はデフォルト値を使用 (Optional[str])
+    @param use_cache: LLM応答キャッシュを使うかどうか (bool)
+    @param max_workers: サブタスクを同時に処理するスレッド数の上限 (int)
+    @param map_reduce: True の場合、サブタスク結果を reduce_token_budget ごとに部分統合し、
+        予算に収まるまで木構造で統合してから最終回答を生成する (bool)
+    @param reduce_token_budget: 1回の統合に渡す結果のトークン数の目安 (int)
     @return: タスクの分解結果、各サブタスクの結果、統合後の最終回答を含む辞書 (Dict[str, Any])
     """
     # Step1: タスク分解チェーン（サブタスクはカンマ区切りの文字列で返ると仮定）
@@ -395,7 +899,9 @@ def orchestration_workflow(
         provider=provider,
         model=model,
     )
-    decomp_result = decompose_chain.invoke({"task": task})
+    decomp_result = invoke_chain(
+        decompose_chain, {"task": task}, use_cache=use_cache, workflow="orchestration"
+    )
     subtasks_str = decomp_result["subtasks"]
     subtasks = [st.strip() for st in subtasks_str.split(",") if st.strip()]
 
@@ -412,12 +918,42 @@ def orchestration_workflow(
             provider=provider,
             model=model,
         )
-        return chain.invoke({"subtask": st})["result"]
+        return invoke_chain(
+            chain, {"subtask": st}, use_cache=use_cache, workflow="orchestration"
+        )["result"]
+
+    # 部分的な統合（map-reduce モード用）
+    reduce_chain = get_chain(
+        prompt_str="以下はサブタスク結果の一部です。要点を落とさずに1つの文章に統合・要約してください:\n{partials}",
+        output_key="partial",
+        provider=provider,
+        model=model,
+    )
 
-    subtask_results = {}
-    import concurrent.futures
+    def reduce_batch(texts: List[str]) -> str:
+        try:
+            return invoke_chain(
+                reduce_chain,
+                {"partials": "\n\n".join(texts)},
+                use_cache=use_cache,
+                workflow="orchestration",
+            )["partial"]
+        except Exception as exc:
+            # 部分統合に失敗しても完了済みのサブタスク結果は捨てず、連結したまま上に渡す
+            print(f"部分統合に失敗したため結果を連結します: {exc}")
+            return "\n\n".join(texts)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    subtask_results = {}
+    reduce_futures = []
+    buffer: List[str] = []
+    buffer_tokens = 0
+    # 部分統合はサブタスクとは別のスレッドプールで実行し、
+    # サブタスクがスレッド数より多くてもキューの後ろで待たせずに始める
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as executor, concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as reduce_executor:
         future_to_st = {executor.submit(process_subtask, st): st for st in subtasks}
         for future in concurrent.futures.as_completed(future_to_st):
             st = future_to_st[future]
@@ -425,6 +961,32 @@ def orchestration_workflow(
                 subtask_results[st] = future.result()
             except Exception as exc:
                 subtask_results[st] = f"Error: {exc}"
+            if not map_reduce:
+                continue
+            # 予算分の結果が溜まった時点で、残りの完了を待たずに部分統合を始める
+            text = f"【{st}】\n{subtask_results[st]}"
+            cost = estimate_tokens(text)
+            if buffer and buffer_tokens + cost > reduce_token_budget:
+                reduce_futures.append(reduce_executor.submit(reduce_batch, buffer))
+                buffer, buffer_tokens = [], 0
+            buffer.append(text)
+            buffer_tokens += cost
+
+        if map_reduce and reduce_futures and buffer:
+            reduce_futures.append(reduce_executor.submit(reduce_batch, buffer))
+        level = [f.result() for f in reduce_futures] if reduce_futures else buffer
+
+        # 部分統合の結果がまだ予算を超える間は、木構造でさらに統合する
+        while (
+            map_reduce
+            and len(level) > 1
+            and sum(estimate_tokens(text) for text in level) > reduce_token_budget
+        ):
+            batches = _split_by_token_budget(level, reduce_token_budget)
+            if len(batches) == len(level):
+                # 1件ずつしか収まらない場合も2件ずつ統合して必ず件数を減らす
+                batches = [level[i : i + 2] for i in range(0, len(level), 2)]
+            level = list(reduce_executor.map(reduce_batch, batches))
 
     # Step3: 統合チェーンで最終回答を生成
     aggregation_chain = get_chain(
@@ -433,8 +995,15 @@ def orchestration_workflow(
         provider=provider,
         model=model,
     )
-    aggregation_result = aggregation_chain.invoke(
-        {"subtask_results": str(subtask_results)}
+    aggregation_result = invoke_chain(
+        aggregation_chain,
+        {
+            "subtask_results": (
+                "\n\n".join(level) if map_reduce else str(subtask_results)
+            )
+        },
+        use_cache=use_cache,
+        workflow="orchestration",
     )
 
     return {
@@ -444,6 +1013,21 @@ def orchestration_workflow(
     }
 
 
+def _split_by_token_budget(texts: List[str], budget: int) -> List[List[str]]:
+    """順序を保ったまま、合計トークン数が budget 以内になるようにまとめる"""
+    batches: List[List[str]] = []
+    used = 0
+    for text in texts:
+        cost = estimate_tokens(text)
+        if batches and used + cost <= budget:
+            batches[-1].append(text)
+            used += cost
+        else:
+            batches.append([text])
+            used = cost
+    return batches
+
+
 ########################################
 # 5. 自律型評価オプティマイザー (Autonomous Evaluation Optimizer)
 ########################################
@@ -452,42 +1036,120 @@ def evaluation_optimizer_workflow(
     iterations: int = 2,
     provider: Optional[str] = None,
     model: Optional[str] = None,
+    use_cache: bool = True,
+    score_threshold: Optional[float] = None,
+    candidates: int = 1,
 ) -> Dict[str, Any]:
-    # 初期回答生成チェーンの構築
+    """
+    score_threshold を指定すると評価で0〜10点のスコアも出させ、閾値に達した時点で打ち切る。
+    candidates > 1 の場合は改善案を candidates 件並列に生成し、最もスコアの高いものを採用する。
+    どちらも指定しなければ従来どおり iterations 回の評価・改善を行う。
+    """
+    scored = score_threshold is not None or candidates > 1
+
+    # 初期回答・評価・改善チェーンの構築（反復中は使い回す）
     init_chain = get_chain(
         prompt_str="次の質問に対する初期回答を生成してください:\n{question}",
         output_key="answer",
         provider=provider,
         model=model,
     )
-    current_answer = init_chain.invoke({"question": question})["answer"]
-
-    # 指定回数だけ評価・改善を反復
-    for i in range(iterations):
-        # 評価チェーンの構築
+    if scored:
         eval_chain = get_chain(
-            prompt_str="以下の回答を評価し、改善点をフィードバックしてください:\n回答: {answer}",
+            prompt_str=(
+                "次の質問に対する回答を0〜10点で評価し、1行目に「スコア: 点数」、"
+                "2行目以降に改善点をフィードバックしてください。\n"
+                "質問: {question}\n回答: {answer}"
+            ),
             output_key="feedback",
             provider=provider,
             model=model,
         )
-        feedback = eval_chain.invoke({"answer": current_answer})["feedback"]
-
-        # 改善チェーンの構築
-        refine_chain = get_chain(
-            prompt_str=(
-                "次の質問に対して、以下のフィードバックを踏まえて回答を改善してください。\n"
-                "質問: {question}\nフィードバック: {feedback}"
-            ),
-            output_key="answer",
+    else:
+        eval_chain = get_chain(
+            prompt_str="以下の回答を評価し、改善点をフィードバックしてください:\n回答: {answer}",
+            output_key="feedback",
             provider=provider,
             model=model,
         )
-        current_answer = refine_chain.invoke(
-            {"question": question, "feedback": feedback}
+    refine_chain = get_chain(
+        prompt_str=(
+            "次の質問に対して、以下のフィードバックを踏まえて回答を改善してください。\n"
+            "質問: {question}\nフィードバック: {feedback}"
+        ),
+        output_key="answer",
+        provider=provider,
+        model=model,
+    )
+
+    def evaluate(answer: str):
+        feedback = invoke_chain(
+            eval_chain,
+            {"question": question, "answer": answer},
+            use_cache=use_cache,
+            workflow="evaluation_optimizer",
+        )["feedback"]
+        return (_parse_score(feedback) if scored else None), feedback
+
+    def refine(feedback: str, cache: bool) -> str:
+        return invoke_chain(
+            refine_chain,
+            {"question": question, "feedback": feedback},
+            use_cache=cache,
+            workflow="evaluation_optimizer",
         )["answer"]
 
-    return {"final_answer": current_answer, "latest_feedback": feedback}
+    current_answer = invoke_chain(
+        init_chain,
+        {"question": question},
+        use_cache=use_cache,
+        workflow="evaluation_optimizer",
+    )["answer"]
+
+    if not scored:
+        # 指定回数だけ評価・改善を反復
+        for i in range(iterations):
+            _, feedback = evaluate(current_answer)
+            current_answer = refine(feedback, use_cache)
+        return {"final_answer": current_answer, "latest_feedback": feedback}
+
+    score, feedback = evaluate(current_answer)
+    rounds = 0
+    for i in range(iterations):
+        if score_threshold is not None and score >= score_threshold:
+            break
+        rounds += 1
+        if candidates > 1:
+            # 同じプロンプトで複数案を出すのでキャッシュは使わない
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=candidates
+            ) as executor:
+                answers = list(
+                    executor.map(lambda _: refine(feedback, False), range(candidates))
+                )
+                evaluations = list(executor.map(evaluate, answers))
+            best = max(range(candidates), key=lambda j: evaluations[j][0])
+            current_answer = answers[best]
+            score, feedback = evaluations[best]
+        else:
+            current_answer = refine(feedback, use_cache)
+            score, feedback = evaluate(current_answer)
+        print(f"評価ラウンド {rounds}: スコア {score}")
+
+    return {
+        "final_answer": current_answer,
+        "latest_feedback": feedback,
+        "score": score,
+        "rounds": rounds,
+    }
+
+
+def _parse_score(feedback: str) -> float:
+    """評価文の「スコア: 点数」を取り出す（見つからなければ 0 点）"""
+    match = re.search(r"スコア\s*[:：]\s*(\d+(?:\.\d+)?)", feedback) or re.search(
+        r"(\d+(?:\.\d+)?)\s*(?:点|/\s*10)", feedback
+    )
+    return float(match.group(1)) if match else 0.0
 
 
 ########################################
@@ -501,7 +1163,13 @@ def analyze_image(
     model: Optional[str] = None,
     additional_images: Optional[List[Union[str, Path]]] = None,
     additional_urls: Optional[List[str]] = None,
+    max_side: Optional[int] = IMAGE_MAX_SIDE,
+    max_bytes: Optional[int] = IMAGE_MAX_BYTES,
 ) -> str:
+    """
+    画像を含むプロンプトを送る。ローカル画像は長辺 max_side px・max_bytes バイトを
+    超える場合に縮小して送る（None で元のまま）。
+    """
     # 少なくとも1つの画像ソースが必要
     if not image_path and not image_url:
         raise ValueError("少なくとも1つの画像パスまたはURLを指定してください")
@@ -516,7 +1184,7 @@ def analyze_image(
 
     # ローカル画像ファイルの処理
     if image_path:
-        content.append(_process_local_image(image_path))
+        content.append(_process_local_image(image_path, max_side, max_bytes))
 
     # 画像URLの処理
     if image_url:
@@ -525,7 +1193,7 @@ def analyze_image(
     # 追加の画像の処理
     if additional_images:
         for img_path in additional_images:
-            content.append(_process_local_image(img_path))
+            content.append(_process_local_image(img_path, max_side, max_bytes))
 
     # 追加のURLの処理
     if additional_urls:
@@ -534,25 +1202,137 @@ def analyze_image(
 
     # メッセージの作成と実行
     message = HumanMessage(content=content)
-    response = llm.invoke([message])
+    response = llm.invoke([message], config=llm_config("image"))
 
     return response.content
 
 
-def _process_local_image(image_path: Union[str, Path]) -> Dict[str, Any]:
-    """ローカル画像ファイルをbase64エンコードしてメッセージコンテンツに変換"""
+def _process_local_image(
+    image_path: Union[str, Path],
+    max_side: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    ローカル画像ファイルをbase64エンコードしてメッセージコンテンツに変換。
+    max_side / max_bytes を超える画像は（Pillow があれば）縮小・再エンコードする。
+    エンコード結果はパス・更新時刻・サイズをキーにキャッシュする。
+    """
     image_path = Path(image_path)
     if not image_path.exists():
         raise FileNotFoundError(f"画像ファイルが見つかりません: {image_path}")
 
-    with open(image_path, "rb") as image_file:
-        base64_image = base64.b64encode(image_file.read()).decode("utf-8")
+    stat = image_path.stat()
+    key = (
+        str(image_path.resolve()),
+        stat.st_mtime_ns,
+        stat.st_size,
+        max_side,
+        max_bytes,
+    )
+    with _image_cache_lock:
+        data_url = _image_cache.get(key)
+        if data_url is not None:
+            _image_cache.move_to_end(key)
+    if data_url is None:
+        data_url = _encode_local_image(image_path, stat.st_size, max_side, max_bytes)
+        _cache_image(key, data_url)
+
+    return {"type": "image_url", "image_url": {"url": data_url}}
+
 
+def _encode_local_image(
+    image_path: Path, size: int, max_side: Optional[int], max_bytes: Optional[int]
+) -> str:
     mime_type = _get_mime_type(image_path)
-    return {
-        "type": "image_url",
-        "image_url": {"url": f"data:{mime_type};base64,{base64_image}"},
-    }
+    resized = _downscale_image(image_path, size, max_side, max_bytes)
+    if resized is not None:
+        data, mime_type = resized
+        base64_image = base64.b64encode(data).decode("ascii")
+    else:
+        # 元のバイト列と base64 文字列を同時に丸ごと持たないよう、3の倍数のチャンクごとに変換する
+        parts = []
+        with open(image_path, "rb") as image_file:
+            while chunk := image_file.read(IMAGE_ENCODE_CHUNK_SIZE):
+                parts.append(base64.b64encode(chunk).decode("ascii"))
+        base64_image = "".join(parts)
+    return f"data:{mime_type};base64,{base64_image}"
+
+
+def _downscale_image(
+    image_path: Path, size: int, max_side: Optional[int], max_bytes: Optional[int]
+):
+    """
+    長辺が max_side を超えるか、ファイルサイズが max_bytes を超える場合に縮小・再エンコードし、
+    (バイト列, MIMEタイプ) を返す。不要な場合や Pillow が無い場合は None。
+    """
+    if not max_side and not max_bytes:
+        return None
+    try:
+        from PIL import Image, UnidentifiedImageError
+    except ImportError:
+        print("Pillow がインストールされていないため画像を縮小せずに送信します")
+        return None
+    import io
+
+    try:
+        image = Image.open(image_path)
+    except (UnidentifiedImageError, OSError):
+        # SVG や HEIC など Pillow で読めない形式は縮小せずにそのまま送る
+        return None
+    with image:
+        too_large = max_side and max(image.size) > max_side
+        too_heavy = max_bytes and size > max_bytes
+        # アニメーションGIFなどは縮小すると壊れるのでそのまま送る
+        if not (too_large or too_heavy) or getattr(image, "is_animated", False):
+            return None
+        try:
+            image.load()
+        except OSError:
+            # 途中で壊れている画像も縮小せずにそのまま送る
+            return None
+        if max_side:
+            image.thumbnail((max_side, max_side))
+        has_alpha = image.mode in ("RGBA", "LA", "P")
+
+        while True:
+            if has_alpha:
+                # 透過のある画像（スクリーンショットなど）は PNG のまま試す
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG", optimize=True)
+                if not max_bytes or buffer.tell() <= max_bytes:
+                    return buffer.getvalue(), "image/png"
+            rgb = image.convert("RGB")
+            for quality in IMAGE_JPEG_QUALITIES:
+                buffer = io.BytesIO()
+                rgb.save(buffer, format="JPEG", quality=quality, optimize=True)
+                if not max_bytes or buffer.tell() <= max_bytes:
+                    return buffer.getvalue(), "image/jpeg"
+            # 最低画質でも収まらなければ解像度を半分にしてやり直す
+            if min(image.size) <= 64:
+                return buffer.getvalue(), "image/jpeg"
+            image = image.resize((image.width // 2, image.height // 2))
+
+
+def _cache_image(key, data_url: str):
+    global _image_cache_bytes
+    if len(data_url) > IMAGE_CACHE_MAX_BYTES:
+        return
+    with _image_cache_lock:
+        previous = _image_cache.pop(key, None)
+        if previous is not None:
+            _image_cache_bytes -= len(previous)
+        _image_cache[key] = data_url
+        _image_cache_bytes += len(data_url)
+        while _image_cache_bytes > IMAGE_CACHE_MAX_BYTES:
+            _, evicted = _image_cache.popitem(last=False)
+            _image_cache_bytes -= len(evicted)
+
+
+def clear_image_cache():
+    global _image_cache_bytes
+    with _image_cache_lock:
+        _image_cache.clear()
+        _image_cache_bytes = 0
 
 
 def _process_image_url(url: str) -> Dict[str, Any]:
@@ -573,3 +1353,283 @@ def _get_mime_type(image_path: Path) -> str:
     }
     #  未知の拡張子の場合はデフォルトのjpegを返す
     return mime_types.get(extension, "image/jpeg")  # デフォルトはjpeg
+
+
+########################################
+# 7. 非同期 (Async)
+########################################
+# 非同期API全体での LLM 同時呼び出し数の上限
+ASYNC_MAX_CONCURRENCY = 4
+_async_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def set_async_concurrency(limit: int):
+    """非同期APIの同時呼び出し数の上限を変更する（以降に作られるイベントループに反映）"""
+    global ASYNC_MAX_CONCURRENCY
+    ASYNC_MAX_CONCURRENCY = limit
+    _async_semaphores.clear()
+
+
+def _async_semaphore() -> asyncio.Semaphore:
+    # asyncio.Semaphore はイベントループに紐づくのでループごとに作る
+    loop = asyncio.get_running_loop()
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+        _async_semaphores[loop] = semaphore
+    return semaphore
+
+
+async def ainvoke_chain(
+    chain, inputs: Dict[str, Any], use_cache: bool = True, workflow: str = None
+) -> Dict[str, Any]:
+    """invoke_chain の非同期版（ASYNC_MAX_CONCURRENCY で同時実行数を制限）"""
+    key = None
+    if use_cache and LLM_CACHE_ENABLED:
+        key, provider, model = _cache_key(chain, inputs)
+        cached = get_llm_cache().get(key)
+        if cached is not None:
+            return {**inputs, **json.loads(cached)}
+
+    async with _async_semaphore():
+        result = await chain.ainvoke(inputs, config=llm_config(workflow))
+    if key is not None:
+        _store_cache(key, chain, result, provider, model)
+    return result
+
+
+async def asimple(
+    topic: Union[str, List[str]],
+    provider: str = None,
+    model: str = None,
+    use_cache: bool = True,
+) -> List[str]:
+    """simple の非同期版。複数トピックは並行に実行し、結果は topic と同じ順序で返す"""
+    topics = [topic] if isinstance(topic, str) else topic
+
+    async def run(t: str) -> str:
+        overall_chain = _simple_chain(provider, model)
+        result = await ainvoke_chain(
+            overall_chain, {"topic": t}, use_cache=use_cache, workflow="simple"
+        )
+        print(f"{t}: {result['explanation']}")
+        return result["explanation"]
+
+    return list(await asyncio.gather(*(run(t) for t in topics)))
+
+
+async def aquestion(
+    topic: str, provider: str = None, model: str = None, use_cache: bool = True
+) -> str:
+    results = await asimple(topic, provider, model, use_cache=use_cache)
+    return results[0]
+
+
+async def aprompt_chain_workflow(
+    topic: str, provider: str = None, model: str = None, use_cache: bool = True
+):
+    """prompt_chain_workflow の非同期版（各セクションの執筆は並行に行う）"""
+    chainOutline = get_chain(
+        prompt_str="トピック「{topic}」について、全体の構成やアウトラインを生成してください。",
+        output_key="outline",
+        provider=provider,
+        model=model,
+    )
+    outlineResult = await ainvoke_chain(
+        chainOutline, {"topic": topic}, use_cache=use_cache, workflow="prompt_chain"
+    )
+    outlineText = outlineResult.get("outline", "").strip()
+    if not outlineText:
+        raise ValueError(
+            f"エラー: トピック '{topic}' に対するアウトライン生成に失敗しました。返却されたアウトラインが空です。"
+        )
+
+    sections = [
+        section.replace("\n", " ").strip()
+        for section in outlineText.split("\n\n")
+        if section.strip()
+    ]
+    if not sections:
+        raise ValueError(
+            f"エラー: アウトラインの分割に失敗しました。期待されるセクションが見つかりません。アウトライン内容: {outlineText}"
+        )
+
+    chainSection = get_chain(
+        prompt_str="以下のセクションの内容を詳細に執筆してください:\n{section}",
+        output_key="detail",
+        provider=provider,
+        model=model,
+    )
+
+    async def draft(section: str) -> str:
+        detailResult = await ainvoke_chain(
+            chainSection,
+            {"section": section},
+            use_cache=use_cache,
+            workflow="prompt_chain",
+        )
+        detailText = detailResult.get("detail", "").strip()
+        if not detailText:
+            raise ValueError(
+                f"エラー: セクション '{section}' の文章生成に失敗しました。返却された文章が空です。"
+            )
+        return detailText
+
+    tasks = [asyncio.ensure_future(draft(section)) for section in sections]
+    try:
+        detailSections = await asyncio.gather(*tasks)
+    except BaseException:
+        # 同期版と同じく1つ失敗したら打ち切り、残りの執筆は取り消す
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    combinedDetails = "\n".join(detailSections)
+    integrationChain = get_chain(
+        prompt_str="以下は各セクションの文章です。これらを統合し、全体として整合性のある文章に補正してください:\n{details}",
+        output_key="finalOutput",
+        provider=provider,
+        model=model,
+    )
+    finalResult = await ainvoke_chain(
+        integrationChain,
+        {"details": combinedDetails},
+        use_cache=use_cache,
+        workflow="prompt_chain",
+    )
+    finalOutput = finalResult.get("finalOutput", "").strip()
+    if not finalOutput:
+        raise ValueError(
+            "エラー: 統合および補正処理により最終文章の生成に失敗しました。"
+        )
+
+    return {"outline": outlineText, "finalOutput": finalOutput}
+
+
+async def arouting_workflow(
+    question: str,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    use_cache: bool = True,
+):
+    """routing_workflow の非同期版"""
+    category = _local_route(question, use_cache)
+    if category is None:
+        start = time.perf_counter()
+        classification = await ainvoke_chain(
+            _route_classify_chain(provider, model),
+            {"question": question},
+            use_cache=use_cache,
+            workflow="routing",
+        )
+        category = classification["category"].strip().lower()
+        # 学習結果の保存（JSON の書き出し）でイベントループを止めないよう別スレッドで行う
+        await asyncio.to_thread(
+            _learn_route, question, category, time.perf_counter() - start
+        )
+
+    if category == "general":
+        prompt_str = "次の質問に簡潔に答えてください:\n{question}"
+    elif category == "specialized":
+        prompt_str = "次の専門的な質問に、詳細に答えてください:\n{question}"
+    else:
+        return {"error": "質問の分類に失敗しました。"}
+    print(category)
+
+    answer_chain = get_chain(
+        prompt_str=prompt_str, output_key="answer", provider=provider, model=model
+    )
+    answer_result = await ainvoke_chain(
+        answer_chain, {"question": question}, use_cache=use_cache, workflow="routing"
+    )
+    answer_result["category"] = category
+    return answer_result
+
+
+async def aparallel_workflow(
+    task: str,
+    subtasks: list,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    use_cache: bool = True,
+):
+    """parallel_workflow の非同期版（同時実行数は ASYNC_MAX_CONCURRENCY まで）"""
+    chain = get_chain(
+        prompt_str="タスク「{subtask}」に対して、{task}",
+        output_key="result",
+        provider=provider,
+        model=model,
+    )
+
+    async def process_subtask(subtask: str) -> str:
+        try:
+            result = await ainvoke_chain(
+                chain,
+                {"subtask": subtask, "task": task},
+                use_cache=use_cache,
+                workflow="parallel",
+            )
+            return result["result"]
+        except Exception as exc:
+            return f"Error: {exc}"
+
+    outputs = await asyncio.gather(*(process_subtask(st) for st in subtasks))
+    return {"task": task, "subtask_results": dict(zip(subtasks, outputs))}
+
+
+async def aorchestration_workflow(
+    task: str,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    use_cache: bool = True,
+):
+    """orchestration_workflow の非同期版"""
+    decompose_chain = get_chain(
+        prompt_str="次のタスクを実行するためのサブタスクに分解してください。サブタスクはカンマ区切りで出力してください。\nタスク: {task}",
+        output_key="subtasks",
+        provider=provider,
+        model=model,
+    )
+    decomp_result = await ainvoke_chain(
+        decompose_chain, {"task": task}, use_cache=use_cache, workflow="orchestration"
+    )
+    subtasks = [st.strip() for st in decomp_result["subtasks"].split(",") if st.strip()]
+
+    chain = get_chain(
+        prompt_str="サブタスク「{subtask}」に対して、詳細な回答を生成してください。",
+        output_key="result",
+        provider=provider,
+        model=model,
+    )
+
+    async def process_subtask(st: str) -> str:
+        try:
+            result = await ainvoke_chain(
+                chain, {"subtask": st}, use_cache=use_cache, workflow="orchestration"
+            )
+            return result["result"]
+        except Exception as exc:
+            return f"Error: {exc}"
+
+    outputs = await asyncio.gather(*(process_subtask(st) for st in subtasks))
+    subtask_results = dict(zip(subtasks, outputs))
+
+    aggregation_chain = get_chain(
+        prompt_str="以下のサブタスク結果を統合して、最終的な回答を生成してください:\n{subtask_results}",
+        output_key="final_answer",
+        provider=provider,
+        model=model,
+    )
+    aggregation_result = await ainvoke_chain(
+        aggregation_chain,
+        {"subtask_results": str(subtask_results)},
+        use_cache=use_cache,
+        workflow="orchestration",
+    )
+
+    return {
+        "decomposition": subtasks,
+        "subtask_results": subtask_results,
+        "final_answer": aggregation_result["final_answer"],
+    }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# src 以下のモジュールはフラットに import されるため、テストからも同じように読めるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
@@ -0,0 +1,28 @@
+from article_preprocess import strip_boilerplate
+
+
+def test_article_sentences_about_cookies_survive():
+    sentences = [
+        "Cookieの利用を巡りChromeがサードパーティCookieの廃止を撤回した。",
+        "クッキーの使用に同意しないユーザーへの広告配信が課題になっている。",
+        "Related work on cookie consent banners shows most users click accept.",
+        "関連記事でも触れたとおり、この変更は広告業界に大きな影響を与える。",
+        "Copyright法の改正についても議論が続いている。",
+    ]
+    text = "\n".join(sentences)
+    assert strip_boilerplate(text) == text
+
+
+def test_short_banner_lines_are_removed():
+    text = "\n".join(
+        [
+            "本文の1段落目です。",
+            "すべてのCookieを受け入れる",
+            "Accept all cookies",
+            "関連記事",
+            "この記事をシェア",
+            "Copyright © 2026 Example Inc. All Rights Reserved.",
+            "本文の2段落目です。",
+        ]
+    )
+    assert strip_boilerplate(text) == "本文の1段落目です。\n本文の2段落目です。"
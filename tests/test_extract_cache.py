@@ -0,0 +1,77 @@
+import os
+import threading
+import concurrent.futures
+
+import trafilatura
+
+import hatena_scraper
+
+
+def _write(directory, name, size, mtime):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prune_removes_expired_then_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(hatena_scraper, "EXTRACT_CACHE_DIR", str(tmp_path))
+    now = 1_000_000.0
+    expired = _write(tmp_path, "expired.txt", 10, now - 100)
+    oldest = _write(tmp_path, "oldest.txt", 40, now - 30)
+    older = _write(tmp_path, "older.txt", 40, now - 20)
+    newest = _write(tmp_path, "newest.txt", 40, now - 10)
+
+    removed = hatena_scraper.prune_extract_cache(ttl=50, max_bytes=80, now=now)
+
+    assert removed == 2
+    assert not os.path.exists(expired)
+    assert not os.path.exists(oldest)
+    assert os.path.exists(older) and os.path.exists(newest)
+
+
+def test_cache_hit_refreshes_last_access(tmp_path, monkeypatch):
+    monkeypatch.setattr(hatena_scraper, "EXTRACT_CACHE_DIR", str(tmp_path))
+    html = "<html><body><p>本文</p></body></html>"
+    path = hatena_scraper._extract_cache_path(html)
+    _write(tmp_path, os.path.basename(path), 10, 0)
+
+    assert hatena_scraper._load_extract_cache(html) == "x" * 10
+    assert hatena_scraper.prune_extract_cache(ttl=3600) == 0
+    assert os.path.exists(path)
+
+
+def test_concurrent_extraction_of_the_same_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(hatena_scraper, "EXTRACT_CACHE_DIR", str(tmp_path))
+    # 8スレッドが揃ってから抽出を終え、キャッシュの書き込みを同時に行わせる
+    barrier = threading.Barrier(8)
+
+    def extract(html, **kwargs):
+        barrier.wait()
+        return "本文"
+
+    monkeypatch.setattr(trafilatura, "extract", extract)
+    html = "<html><body><p>本文</p></body></html>"
+
+    for _ in range(30):
+        for path in tmp_path.iterdir():
+            path.unlink()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(hatena_scraper.extract_article_text, [html] * 8)
+            )
+        assert results == ["本文"] * 8
+        assert [p.name for p in tmp_path.iterdir()] == [
+            os.path.basename(hatena_scraper._extract_cache_path(html))
+        ]
+
+
+def test_failed_cache_write_keeps_the_article(tmp_path, monkeypatch):
+    # キャッシュの保存先がファイルなのでディレクトリを作れない
+    blocker = tmp_path / "extract"
+    blocker.write_text("")
+    monkeypatch.setattr(hatena_scraper, "EXTRACT_CACHE_DIR", str(blocker))
+    monkeypatch.setattr(trafilatura, "extract", lambda html, **kwargs: "本文")
+
+    assert hatena_scraper.extract_article_text("<p>本文</p>") == "本文"
@@ -0,0 +1,47 @@
+import get_news_hatena
+from get_news_hatena import ArticleSummaries, ArticleSummary
+
+
+class FakeStructuredLlm:
+    def __init__(self, response):
+        self.response = response
+
+    def with_structured_output(self, schema):
+        return self
+
+    def batch(self, prompts, config=None, return_exceptions=False):
+        return [self.response] * len(prompts)
+
+
+def test_packed_summary_with_too_few_points_falls_back(monkeypatch):
+    response = ArticleSummaries(
+        items=[
+            ArticleSummary(
+                index=0, summaryTitle="十分", points=["a", "b", "c"], summary="要約"
+            ),
+            ArticleSummary(index=1, summaryTitle="不足", points=["a"], summary="要約"),
+        ]
+    )
+    fallback = {"summaryTitle": "個別", "points": ["x", "y", "z"], "summary": "個別"}
+    retried = []
+
+    def summarize_batch(articles):
+        retried.extend(articles)
+        return [fallback] * len(articles)
+
+    monkeypatch.setattr(
+        get_news_hatena, "get_llm", lambda *args: FakeStructuredLlm(response)
+    )
+    monkeypatch.setattr(get_news_hatena, "_summarize_batch", summarize_batch)
+
+    results = get_news_hatena._summarize_packed([("記事0", "本文"), ("記事1", "本文")])
+
+    assert results[0]["points"] == ["a", "b", "c"]
+    assert results[1] == fallback
+    assert retried == [("記事1", "本文")]
+    get_news_hatena.convert_news_json_to_markdown(
+        [
+            {"rank": i + 1, "url": "", "title": "t", "users": 1, **r}
+            for i, r in enumerate(results)
+        ]
+    )
@@ -0,0 +1,44 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+import hatena_scraper
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "hotentry_it.html")
+
+
+@pytest.fixture(scope="module")
+def html():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parsers_return_identical_entries(html):
+    expected = hatena_scraper.parse_hatena_entries(html, parser="html.parser")
+    assert len(expected) == 5
+    assert expected[2] == {
+        "title": "主要ブラウザの新バージョンが公開、開発者向け機能を強化 & 高速化",
+        "url": "https://example.net/news/browser-release?utm_source=hb&utm_medium=rss",
+        "date": "2026/10/17 13:05",
+        "users": "97",
+    }
+    for parser in ("selectolax", "lxml"):
+        if not hatena_scraper.parser_available(parser):
+            pytest.skip(f"{parser} is not installed")
+        assert hatena_scraper.parse_hatena_entries(html, parser=parser) == expected
+
+
+def test_default_parser_is_resolved_on_first_parse(html):
+    # import しただけではパーサのライブラリを読み込まない
+    code = (
+        "import sys, hatena_scraper; "
+        "assert hatena_scraper.DEFAULT_HTML_PARSER is None; "
+        "assert 'selectolax' not in sys.modules"
+    )
+    src = os.path.dirname(hatena_scraper.__file__)
+    subprocess.run([sys.executable, "-c", code], cwd=src, check=True)
+
+    hatena_scraper.parse_hatena_entries(html)
+    assert hatena_scraper.default_html_parser() in hatena_scraper.HTML_PARSERS
@@ -0,0 +1,68 @@
+import os
+import shutil
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import hatena_scraper
+import http_client
+from http_cache import HttpCache
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def hotentry_server(tmp_path):
+    """fixtures の RSS を /hotentry/it.rss として配信するローカルサーバ"""
+    root = tmp_path / "site"
+    (root / "hotentry").mkdir(parents=True)
+    shutil.copy(os.path.join(FIXTURES, "hotentry_it.rss"), root / "hotentry" / "it.rss")
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(_Handler, directory=str(root))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    def use(ttl):
+        cache = HttpCache(cache_dir=str(tmp_path / "http"), ttl=ttl)
+        monkeypatch.setattr(http_client, "_cache", cache)
+        monkeypatch.setattr(http_client, "CACHE_ENABLED", True)
+        return cache
+
+    return use
+
+
+@pytest.mark.parametrize("ttl", [3600, 0], ids=["fresh-hit", "revalidated-304"])
+def test_rss_fetched_twice_through_cache(hotentry_server, cache, monkeypatch, ttl):
+    http_cache = cache(ttl)
+    monkeypatch.setattr(
+        hatena_scraper, "HOTENTRY_BASE_URL", f"{hotentry_server}/hotentry"
+    )
+
+    first = hatena_scraper.fetch_hatena_rss_entries("it")
+    # ストリーミングで読み終えた本文がキャッシュに保存されている
+    assert http_cache.lookup(f"{hotentry_server}/hotentry/it.rss") is not None
+    # 2回目はキャッシュ（TTL 内）か 304 で再検証したキャッシュから読む
+    second = hatena_scraper.fetch_hatena_rss_entries("it")
+
+    assert [item["title"] for item in first] == [
+        "Rustの非同期ランタイムを自作して分かったこと",
+        "SQLiteを本番で使うためのチューニング",
+        "主要ブラウザの新バージョンが公開、開発者向け機能を強化",
+    ]
+    assert first[0]["url"] == "https://example.com/articles/rust-async"
+    assert first[0]["users"] == "412"
+    assert second == first
@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+import llm_metrics
+
+
+def _run(handler, tokens=(), llm_output=None):
+    run_id = uuid.uuid4()
+    handler.on_chat_model_start({}, [[]], run_id=run_id, metadata={})
+    for token in tokens:
+        handler.on_llm_new_token(token, run_id=run_id)
+    message = AIMessage(content="".join(tokens) or "ok")
+    handler.on_llm_end(
+        LLMResult(
+            generations=[[ChatGeneration(message=message)]], llm_output=llm_output
+        ),
+        run_id=run_id,
+    )
+    return handler.records[-1]
+
+
+def test_ttft_is_recorded_only_for_streamed_calls():
+    handler = llm_metrics.MetricsCallbackHandler()
+    plain = _run(handler)
+    streamed = _run(handler, tokens=["こん", "にちは"])
+
+    assert plain["ttft"] is None
+    assert 0 <= streamed["ttft"] <= streamed["latency"]
+    (group,) = llm_metrics.summarize(handler.records).values()
+    assert group["calls"] == 2
+    assert group["streamed"] == 1
+    assert group["ttft_total"] == streamed["ttft"]
+
+
+def test_hedge_and_failover_are_recorded_from_the_served_provider():
+    handler = llm_metrics.MetricsCallbackHandler()
+    _run(handler)
+    served = {"provider": "openai", "model": "gpt-4o-mini"}
+    hedged = _run(handler, llm_output={**served, "hedged": True, "failover": False})
+    _run(handler, llm_output={**served, "hedged": False, "failover": True})
+
+    assert hedged["provider"] == "openai" and hedged["hedged"]
+    groups = llm_metrics.summarize(handler.records)
+    openai = groups["openai/gpt-4o-mini/"]
+    assert (openai["calls"], openai["hedged"], openai["failovers"]) == (2, 1, 1)
+    assert "llm_failovers_total" in llm_metrics._prometheus_text(groups)
+
+
+def test_report_is_written_when_the_run_fails(monkeypatch):
+    import get_news_hatena
+
+    written = []
+
+    def fail():
+        raise RuntimeError("summarize failed")
+
+    monkeypatch.setattr(get_news_hatena, "fetch_hatena_news_entries", fail)
+    monkeypatch.setattr(
+        get_news_hatena.llm_metrics, "write_report", lambda name: written.append(name)
+    )
+    with pytest.raises(RuntimeError):
+        get_news_hatena.main(publish=False)
+    assert len(written) == 1
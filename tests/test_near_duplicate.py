@@ -0,0 +1,28 @@
+from near_duplicate import NearDuplicateIndex, dedupe_entries
+
+BODY = (
+    "Anthropicは開発者向けのコーディングツールに新しい機能を追加したと発表した。"
+    "ターミナルから直接コードの修正やテストの実行を任せられるようになり、"
+    "大規模なリポジトリでも変更箇所を自動で探して提案できるという。"
+)
+
+
+def test_same_story_is_deduped():
+    entries = [
+        {"title": "コーディングツールに新機能", "url": "https://a.example/1"},
+        {"title": "新機能を発表、コーディングツール", "url": "https://b.example/2"},
+    ]
+    kept, skipped = dedupe_entries(entries, [BODY, BODY], NearDuplicateIndex())
+    assert kept == [0]
+    assert [i for i, _ in skipped] == [1]
+
+
+def test_entries_without_body_are_not_deduped_by_title():
+    entries = [
+        {"title": "Claude Codeの使い方まとめ", "url": "https://a.example/1"},
+        {"title": "Claude Codeの使い方メモ", "url": "https://b.example/2"},
+        {"title": "Claude Codeの使い方まとめ", "url": "https://c.example/3"},
+    ]
+    kept, skipped = dedupe_entries(entries, ["", "", BODY], NearDuplicateIndex())
+    assert kept == [0, 1, 2]
+    assert skipped == []
@@ -0,0 +1,96 @@
+import time
+import asyncio
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from llm_scheduler import RateBudget, RateLimitCallbackHandler
+from resilient_llm import ResilientChatModel
+
+
+class FakeChatModel(BaseChatModel):
+    name: str
+    delay: float = 0.0
+    error: Exception = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _get_ls_params(self, stop=None, **kwargs):
+        return {"ls_provider": self.name, "ls_model_name": "fake"}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(self.name))])
+
+    def with_structured_output(self, schema, **kwargs):
+        def parse(input):
+            if self.error is not None:
+                raise self.error
+            return {"provider": self.name}
+
+        return RunnableLambda(parse)
+
+
+def exhausted_rate_limit(wait):
+    """レート制限の予算を使い切った状態にし、次の呼び出しを wait 秒ほど待たせる"""
+    budget = RateBudget(rpm=60 / wait, tpm=1_000_000)
+    budget.requests = 0
+    return RateLimitCallbackHandler(budget)
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_hedge_timer_starts_when_the_primary_request_starts(mode):
+    primary = FakeChatModel(
+        name="primary", delay=0.05, callbacks=[exhausted_rate_limit(0.4)]
+    )
+    llm = ResilientChatModel(
+        primary=primary,
+        secondary=FakeChatModel(name="secondary"),
+        hedge_initial_delay=0.2,
+    )
+
+    if mode == "sync":
+        message = llm.invoke("質問")
+    else:
+        message = asyncio.run(llm.ainvoke("質問"))
+
+    assert message.content == "primary"
+    assert llm.get_stats()["hedged"] == 0
+    # 記録するレイテンシにレート制限の待ちは含めない
+    assert max(llm._latencies) < 0.2
+
+
+def test_slow_primary_is_hedged():
+    llm = ResilientChatModel(
+        primary=FakeChatModel(name="primary", delay=0.5),
+        secondary=FakeChatModel(name="secondary"),
+        hedge_initial_delay=0.1,
+    )
+
+    assert llm.invoke("質問").content == "secondary"
+    assert llm.get_stats()["hedge_wins"] == 1
+
+
+def test_structured_output_fails_over_only_on_failover_errors():
+    secondary = FakeChatModel(name="secondary")
+    llm = ResilientChatModel(
+        primary=FakeChatModel(name="primary", error=RateLimited("rate limited")),
+        secondary=secondary,
+    )
+    assert llm.with_structured_output(dict).invoke("質問") == {"provider": "secondary"}
+
+    llm = ResilientChatModel(
+        primary=FakeChatModel(name="primary", error=ValueError("invalid schema")),
+        secondary=secondary,
+    )
+    with pytest.raises(ValueError):
+        llm.with_structured_output(dict).invoke("質問")
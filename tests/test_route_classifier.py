@@ -0,0 +1,35 @@
+import json
+import threading
+
+from route_classifier import RouteClassifier, _keyword_score, _normalize
+
+
+def test_ascii_keywords_match_whole_words_only():
+    assert _keyword_score(_normalize("rapid prototyping")) == 0
+    assert _keyword_score(_normalize("https://example.com/recipes")) == 0
+    assert _keyword_score(_normalize("REST APIの設計")) > 0
+    assert _keyword_score(_normalize("Pythonでhttpサーバを書く")) > 0
+
+
+def test_concurrent_learn_saves_do_not_collide(tmp_path):
+    path = tmp_path / "route_classifier.json"
+    classifier = RouteClassifier(path=str(path))
+    errors = []
+
+    def learn(n):
+        try:
+            for i in range(20):
+                classifier.learn(f"質問 {n}-{i}", "general")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=learn, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["examples"] == 80
+    assert list(tmp_path.iterdir()) == [path]
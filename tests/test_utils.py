@@ -0,0 +1,173 @@
+import asyncio
+import base64
+import time
+import threading
+
+import pytest
+
+import utils
+
+
+def test_llm_cache_is_created_once_under_concurrent_first_use(monkeypatch):
+    created = []
+
+    class SlowCache:
+        def __init__(self, path=None):
+            time.sleep(0.05)
+            created.append(self)
+
+    monkeypatch.setattr(utils, "LlmCache", SlowCache)
+    monkeypatch.setattr(utils, "_llm_cache", None)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(utils.get_llm_cache()))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(cache is created[0] for cache in results)
+
+
+def test_image_cache_is_bounded_by_encoded_size(tmp_path, monkeypatch):
+    # 3000 バイトの画像は base64 で 4000 文字 + data URL の接頭辞になる
+    monkeypatch.setattr(utils, "IMAGE_CACHE_MAX_BYTES", 10_000)
+    utils.clear_image_cache()
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"screenshot{i}.png"
+        path.write_bytes(bytes([i]) * 3000)
+        paths.append(path)
+        utils._process_local_image(path)
+
+    assert len(utils._image_cache) == 2
+    assert utils._image_cache_bytes == sum(map(len, utils._image_cache.values()))
+    assert utils._image_cache_bytes <= utils.IMAGE_CACHE_MAX_BYTES
+
+    # 上限より大きい画像はキャッシュしない
+    large = tmp_path / "large.png"
+    large.write_bytes(b"x" * 9000)
+    utils._process_local_image(large)
+    assert len(utils._image_cache) == 2
+    utils.clear_image_cache()
+    assert utils._image_cache_bytes == 0
+
+
+def _fake_orchestration(monkeypatch, subtasks, on_reduce):
+    """チェーンを output_key で見分ける偽の get_chain / invoke_chain を差し込む"""
+    done = []
+    lock = threading.Lock()
+
+    def invoke_chain(chain, inputs, use_cache=True, workflow=None):
+        if chain == "subtasks":
+            return {"subtasks": ",".join(subtasks)}
+        if chain == "result":
+            time.sleep(0.02)
+            with lock:
+                done.append(inputs["subtask"])
+            return {"result": inputs["subtask"] * 400}
+        if chain == "partial":
+            with lock:
+                completed = len(done)
+            return {"partial": on_reduce(inputs["partials"], completed)}
+        return {"final_answer": inputs["subtask_results"]}
+
+    monkeypatch.setattr(
+        utils, "get_chain", lambda prompt_str, output_key, **_: output_key
+    )
+    monkeypatch.setattr(utils, "invoke_chain", invoke_chain)
+
+
+def test_map_reduce_starts_reducing_before_all_subtasks_finish(monkeypatch):
+    subtasks = [f"t{i}" for i in range(12)]
+    completed_at_reduce = []
+
+    def on_reduce(partials, completed):
+        completed_at_reduce.append(completed)
+        return "p"
+
+    _fake_orchestration(monkeypatch, subtasks, on_reduce)
+    utils.orchestration_workflow(
+        "task", max_workers=2, map_reduce=True, reduce_token_budget=250
+    )
+
+    assert completed_at_reduce
+    assert min(completed_at_reduce) < len(subtasks) // 2
+
+
+def test_map_reduce_keeps_subtask_results_when_a_reduce_fails(monkeypatch):
+    subtasks = [f"t{i}" for i in range(6)]
+
+    def on_reduce(partials, completed):
+        raise RuntimeError("reduce failed")
+
+    _fake_orchestration(monkeypatch, subtasks, on_reduce)
+    result = utils.orchestration_workflow(
+        "task", max_workers=2, map_reduce=True, reduce_token_budget=250
+    )
+
+    for st in subtasks:
+        assert st * 400 in result["final_answer"]
+
+
+def test_route_classifier_is_created_once_under_concurrent_first_use(monkeypatch):
+    created = []
+
+    class SlowClassifier:
+        def __init__(self):
+            time.sleep(0.05)
+            created.append(self)
+
+    monkeypatch.setattr(utils, "RouteClassifier", SlowClassifier)
+    monkeypatch.setattr(utils, "_route_classifier", None)
+    threads = [threading.Thread(target=utils.get_route_classifier) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+
+
+def test_images_pillow_cannot_decode_are_sent_as_is(tmp_path):
+    svg = tmp_path / "diagram.svg"
+    svg.write_text('<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"/>')
+    utils.clear_image_cache()
+
+    content = utils._process_local_image(svg, max_side=2048, max_bytes=1024)
+
+    url = content["image_url"]["url"]
+    assert base64.b64decode(url.split(",", 1)[1]) == svg.read_bytes()
+    utils.clear_image_cache()
+
+
+def test_aprompt_chain_cancels_other_drafts_when_one_is_empty(monkeypatch):
+    cancelled = []
+
+    async def ainvoke_chain(chain, inputs, **kwargs):
+        if chain == "outline":
+            return {"outline": "空になる節\n\n時間のかかる節"}
+        if inputs["section"] == "空になる節":
+            return {"detail": ""}
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(inputs["section"])
+            raise
+        return {"detail": "本文"}
+
+    monkeypatch.setattr(
+        utils, "get_chain", lambda prompt_str, output_key, **kw: output_key
+    )
+    monkeypatch.setattr(utils, "ainvoke_chain", ainvoke_chain)
+
+    async def run():
+        with pytest.raises(ValueError):
+            await utils.aprompt_chain_workflow("topic")
+        # 例外が返る時点で残りの執筆は取り消し済み
+        assert cancelled == ["時間のかかる節"]
+
+    asyncio.run(run())